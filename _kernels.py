@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # без numba ядра работают как обычный Python, просто медленнее
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+@njit(cache=True, fastmath=True)
+def zone_seconds(hrs, dts, lower, upper, out):
+    """
+    Секунды по зонам пульса: интервал dts[i] относим к зоне z с
+    lower[z] <= hrs[i] <= upper[z]. Пульс между зонами (114.5 при 0–114 и
+    115–134) не попадает ни в одну. Результат копится в out.
+    """
+    for i in range(hrs.size):
+        h = hrs[i]
+        for z in range(upper.size):
+            if h <= upper[z]:
+                if h >= lower[z]:
+                    out[z] += dts[i]
+                break
+
+
+@njit(cache=True)
+def split_mean_hr(hr_t, hr_v, split_bounds, out):
+    """
+    Средний пульс по сплитам. hr_t отсортирован (int64, мкс),
+    сплит k — замеры с split_bounds[k] <= t <= split_bounds[k + 1] (границы включительно).
+    Пустой сплит -> 0.
+    """
+    n = hr_t.size
+    j = 0
+    for k in range(split_bounds.size - 1):
+        lo = split_bounds[k]
+        hi = split_bounds[k + 1]
+        while j < n and hr_t[j] < lo:
+            j += 1
+
+        total = 0.0
+        count = 0
+        i = j
+        while i < n and hr_t[i] <= hi:
+            total += hr_v[i]
+            count += 1
+            i += 1
+
+        out[k] = total / count if count > 0 else 0.0
+
+
+@njit(cache=True)
+def convert_units_loop(values, codes, mul, div, out):
+    """
+    Пересчёт единиц по коду: out[i] = values[i] * mul[c] / div[c], c = codes[i].
+    У каждого кода один из множителей — 1.0, так что результат совпадает
+    до бита с обычным v / 1000.0 или v * 1.60934. NaN остаётся NaN.
+    """
+    for i in range(values.size):
+        c = codes[i]
+        out[i] = values[i] * mul[c] / div[c]
+
+
+def convert_units_numpy(values, codes, mul, div, out):
+    """То же, что convert_units_loop, выборкой numpy: те же операции, тот же результат до бита."""
+    out[:] = values * mul[codes] / div[codes]
+
+
+# с numba — скомпилированный цикл без временных массивов;
+# без неё цикл на Python медленнее numpy, поэтому берём выборку
+convert_units = convert_units_loop if HAVE_NUMBA else convert_units_numpy
+
+
+def unit_codes(units, codes: dict) -> np.ndarray:
+    """Колонка единиц -> int8-коды по словарю codes (неизвестные и пустые -> 0)."""
+    mapped = pd.Series(np.asarray(units, dtype=object)).map(codes)
+    return mapped.fillna(0).to_numpy(dtype=np.int8)
+
+
+def _warm_up():
+    # компилируем (или поднимаем из кэша) сразу, чтобы первая тренировка не ждала JIT
+    hrs = np.linspace(100.0, 180.0, 8)
+    zone_seconds(
+        hrs,
+        np.ones(8),
+        np.array([0.0, 115.0, 135.0, 150.0, 170.0]),
+        np.array([114.0, 134.0, 149.0, 169.0, 10_000.0]),
+        np.zeros(5),
+    )
+    split_mean_hr(np.arange(8, dtype=np.int64), hrs, np.array([0, 4, 7], dtype=np.int64), np.zeros(2))
+    convert_units_loop(hrs, np.zeros(8, dtype=np.int8), np.ones(1), np.ones(1), np.empty(8))
+
+
+# без numba компилировать нечего
+if HAVE_NUMBA:
+    _warm_up()
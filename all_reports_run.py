@@ -1,49 +1,159 @@
     # all_reports_run.py
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
-import subprocess
+import importlib
+import os
 import sys
+import traceback
 
-# какие скрипты запускать и в каком порядке
-SCRIPTS = [
-    "extract_vo2max.py",
-    "extract_weight_and_vo2.py",
-    "walks_by_week.py",
-    "walks_total.py",
-    "weekly_from_daily.py",
+import extract_vo2max
+import extract_weight_and_vo2
+import walks_by_week
+import walks_report
+import walks_total
+import weekly_from_daily
+from cache import is_fresh, load_records
+from health_xml import parse_once, register
+from output_dir import REPORTS_DIR_ENV
+
+XML_FILE = Path("export.xml")
+
+# эти скрипты не парсят export.xml одним проходом вместе с остальными:
+# health_last_walk сначала ищет тренировку, а потом уже пульс/дистанцию
+# внутри неё по кэшу записей — он независим и идёт параллельно с остальными
+PARALLEL_SCRIPTS = [
     "health_last_walk.py",
 ]
 
+
+def run_script(script_name: str) -> None:
+    """
+    Запуск скрипта в текущем процессе: импорт модуля и его main().
+    pandas / lxml / openpyxl уже загружены — без нового интерпретатора.
+    """
+    module = importlib.import_module(Path(script_name).stem)
+    # скрипты читают аргументы из sys.argv — отдаём им «чистый» запуск без дат
+    sys.argv = [script_name]
+    module.main()
+
+
+def report_failure(name: str, exc: BaseException) -> None:
+    print(f"[ERROR] {name} завершился с ошибкой: {exc}")
+    traceback.print_exception(exc)
+
+
+def run_single_pass(xml_path: Path) -> None:
+    """VO2max, вес + VO2max, недельная и дневная ходьба (и недели по дням) — за один разбор XML."""
+    vo2_best = {}
+    weight_cols = extract_weight_and_vo2.record_columns()
+
+    handlers = {}
+    register(handlers, [extract_vo2max.VO2_TYPE], partial(extract_vo2max.collect, best=vo2_best))
+    register(handlers, extract_weight_and_vo2.RECORD_TYPES, partial(extract_weight_and_vo2.collect, cols=weight_cols))
+    # листы ходьбы — те же колбэки и таблицы, что у walks_report
+    walk_tables = walks_report.register_walks(handlers)
+
+    print(f"=== Разбор {xml_path} (один проход) ===")
+    parse_once(xml_path, handlers)
+
+    write_reports(
+        sorted(vo2_best.items()),
+        extract_weight_and_vo2.aggregate_daily(extract_weight_and_vo2.records_frame(weight_cols)),
+        *walk_tables(),
+    )
+
+
+def run_from_cache(xml_path: Path) -> None:
+    """Те же отчёты по свежему кэшу записей и общему Parquet тренировок — без разбора XML."""
+    print(f"=== Кэш {xml_path} свежий, читаю Parquet ===")
+    write_reports(
+        extract_vo2max.extract_vo2_since_cutoff(),
+        extract_weight_and_vo2.parse_export(xml_path),
+        *walks_report.parse_walks(xml_path),
+    )
+
+
+def write_reports(vo2_daily, weight_daily, df_workouts, df_daily_dist, df_watch_workouts) -> None:
+    """Пишет отчёты по уже собранным данным — одинаково для кэша и общего прохода."""
+    print("=== extract_vo2max ===")
+    extract_vo2max.report(vo2_daily)
+
+    print("=== extract_weight_and_vo2 ===")
+    extract_weight_and_vo2.report(weight_daily)
+
+    print("=== walks_by_week ===")
+    walks_by_week.report(df_workouts)
+
+    print("=== walks_total ===")
+    daily_table = walks_total.report(df_daily_dist, df_watch_workouts)
+
+    # недели — из той же таблицы в памяти, без чтения daily_walk.xlsx
+    print("=== weekly_from_daily ===")
+    weekly_from_daily.report(daily_table)
+
+
 def main() -> None:
     project_root = Path(__file__).resolve().parent
     reports_dir = project_root / "reports"
     reports_dir.mkdir(exist_ok=True)
 
-    # какие xlsx были до запуска
-    before = {p.resolve() for p in project_root.glob("*.xlsx")}
+    # все скрипты (и дочерние процессы) пишут xlsx сразу в reports/ —
+    # без сравнения glob до/после, которое гоняется при параллельном запуске
+    os.environ[REPORTS_DIR_ENV] = str(reports_dir)
 
-    # запускаем все скрипты тем же интерпретатором (venv)
-    for script_name in SCRIPTS:
+    scripts = []
+    for script_name in PARALLEL_SCRIPTS:
         script_path = project_root / script_name
         if not script_path.exists():
             print(f"[WARN] Скрипт {script_name} не найден, пропускаю")
             continue
+        scripts.append(script_name)
+
+    # ошибка одного отчёта не останавливает остальные — список в конце
+    failed = []
+
+    # кэш записей — один раз до пула: иначе health_last_walk строит его
+    # в своём процессе (а то и своим пулом), пока основной процесс
+    # разбирает тот же export.xml общим проходом
+    if not is_fresh(XML_FILE):
+        print(f"=== Кэш записей {XML_FILE} ===")
+        try:
+            load_records(XML_FILE)
+        except Exception as exc:
+            report_failure("кэш записей", exc)
+
+    with ProcessPoolExecutor(max_workers=max(1, min(len(scripts), os.cpu_count() or 1))) as ex:
+        futures = {}
+        for script_name in scripts:
+            print(f"=== Запуск {script_name} (параллельно) ===")
+            futures[ex.submit(run_script, script_name)] = script_name
 
-        print(f"=== Запуск {script_name} ===")
-        subprocess.run([sys.executable, str(script_path)], check=True)
+        # отчёты по кэшу — в основном процессе, пока скрипты работают в пуле;
+        # общий проход по XML — только если кэш не сохранился (нет pyarrow)
+        try:
+            if is_fresh(XML_FILE):
+                run_from_cache(XML_FILE)
+            else:
+                run_single_pass(XML_FILE)
+        except Exception as exc:
+            report_failure("общий проход", exc)
+            failed.append("общий проход")
 
-    # какие xlsx появились после
-    after = {p.resolve() for p in project_root.glob("*.xlsx")}
-    new_files = after - before
+        for future in as_completed(futures):
+            script_name = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                report_failure(script_name, exc)
+                failed.append(script_name)
+                continue
+            print(f"=== {script_name} завершён ===")
 
-    # переносим только новые xlsx в reports/
-    for path in new_files:
-        target = reports_dir / path.name
-        if target.exists():
-            target.unlink()  # перезаписать, если файл с таким именем уже был
-        path.rename(target)
-        print(f"Переместил {path.name} -> {reports_dir.name}/")
+    if failed:
+        raise SystemExit(f"Готово с ошибками: {', '.join(failed)}")
 
     print("Готово.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
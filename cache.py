@@ -0,0 +1,226 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from health_xml import RecordColumns, open_records, free, read_record_columns, read_workout_columns, split_records
+
+EXPORT_XML = Path("export.xml")
+CACHE_FILE = Path(".export_cache.parquet")
+
+# атрибуты <Record>, которые нужны скриптам
+RECORD_COLUMNS = ["type", "startDate", "endDate", "value", "unit", "sourceName", "device"]
+# повторяющиеся строки — category: 1-2 байта на строку вместо объекта str
+CATEGORY_COLUMNS = ["type", "unit", "sourceName", "device"]
+
+# export.xml меньше этого разбираем в одном процессе: запуск пула дороже разбора
+PARALLEL_MIN_BYTES = 256 << 20
+
+NAN = float("nan")
+
+
+def to_float(s) -> float:
+    # тем же float(), что и при разборе XML, — значения совпадают до бита
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def to_floats(values) -> np.ndarray:
+    """Колонка строк -> float64 через to_float (NaN для пустых/битых)."""
+    return np.fromiter((to_float(v) for v in values), dtype=np.float64, count=len(values))
+
+
+def to_datetime(values: list) -> pd.Series:
+    # "2025-11-30 12:51:18 +0100" -> локальное время без зоны, как parse_apple_datetime
+    return pd.to_datetime(
+        pd.Series(values, dtype="object").str[:19],
+        format="%Y-%m-%d %H:%M:%S",
+        errors="coerce",
+    ).astype("datetime64[s]")
+
+
+def build_records(xml_path: Path) -> pd.DataFrame:
+    """Один проход по export.xml: все <Record> в таблицу с колонками RECORD_COLUMNS."""
+    # повторяющиеся строки сразу кодируем — без объекта str на каждую запись
+    records = RecordColumns(RECORD_COLUMNS, CATEGORY_COLUMNS)
+    add = records.add
+
+    print(f"Читаю {xml_path} в кэш …")
+    context = open_records(xml_path, "Record")
+
+    processed = 0
+    spinner = ["|", "/", "-", "\\"]
+    start_time = time.time()
+
+    for _, elem in context:
+        processed += 1
+        if processed % 100000 == 0:
+            elapsed = time.time() - start_time
+            speed = processed / elapsed if elapsed > 0 else 0
+            spin = spinner[(processed // 100000) % 4]
+            sys.stdout.write(f"\r{spin} Обработано: {processed:,} | ~{speed:,.0f}/сек")
+            sys.stdout.flush()
+
+        add(elem.get)
+        free(elem)
+
+    del context
+
+    elapsed = time.time() - start_time
+    sys.stdout.write(f"\r✓ Обработано: {processed:,} | Время: {elapsed:.1f} c\n")
+    sys.stdout.flush()
+
+    return records_frame(records.close())
+
+
+def coded_categorical(codes, index: dict) -> pd.Categorical:
+    """
+    Колонка из RecordColumns (коды, словарь строка -> код) -> pd.Categorical
+    с отсортированными категориями и None -> NaN, как pd.Categorical(строки).
+    """
+    values = list(index)  # по коду: словарь хранит порядок первых появлений
+    categories = sorted(v for v in values if v is not None)
+    position = {v: i for i, v in enumerate(categories)}
+    remap = np.array([position.get(v, -1) for v in values], dtype=np.int32)
+    return pd.Categorical.from_codes(remap[np.frombuffer(codes, dtype=np.int32)], categories=categories)
+
+
+def records_frame(cols: dict) -> pd.DataFrame:
+    """Сырые колонки Record (строки и коды) -> типизированная таблица RECORD_COLUMNS."""
+    df = pd.DataFrame({name: coded_categorical(*cols[name]) for name in CATEGORY_COLUMNS})
+    df["startDate"] = to_datetime(cols["startDate"])
+    df["endDate"] = to_datetime(cols["endDate"])
+    # float64, а не float32: иначе VO2max / вес в отчётах разойдутся в последних знаках
+    df["value"] = to_floats(cols["value"])
+    return df[RECORD_COLUMNS]
+
+
+def records_part(xml_path: Path, start: int, end: int) -> pd.DataFrame:
+    """Один кусок export.xml (для пула процессов) — сразу типизированной таблицей."""
+    return records_frame(read_record_columns(xml_path, RECORD_COLUMNS, start, end, CATEGORY_COLUMNS))
+
+
+def build_records_parallel(xml_path: Path, workers: int) -> pd.DataFrame:
+    """
+    То же, что build_records, но тело export.xml режется на workers кусков
+    по границам <Record>, и каждый кусок разбирает свой процесс.
+    Куски склеиваются в исходном порядке.
+    """
+    ranges = split_records(xml_path, workers)
+    print(f"Читаю {xml_path} в кэш ({len(ranges)} процессов) …")
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as ex:
+        parts = list(ex.map(records_part, repeat(xml_path), *zip(*ranges)))
+
+    # у кусков разные наборы категорий — объединяем (отсортированно, как pd.Categorical)
+    df = pd.DataFrame(
+        {
+            name: union_categoricals([p[name] for p in parts], sort_categories=True)
+            for name in CATEGORY_COLUMNS
+        }
+    )
+    for name in ["startDate", "endDate", "value"]:
+        df[name] = np.concatenate([p[name].to_numpy() for p in parts])
+
+    elapsed = time.time() - start_time
+    print(f"✓ Обработано: {len(df):,} | Время: {elapsed:.1f} c")
+    return df[RECORD_COLUMNS]
+
+
+def source_contains(records: pd.DataFrame, mark: str) -> pd.Series:
+    """Маска: mark есть в sourceName или в device (например, "Watch")."""
+    return (
+        records["sourceName"].astype("string").str.contains(mark, regex=False, na=False)
+        | records["device"].astype("string").str.contains(mark, regex=False, na=False)
+    )
+
+
+def save_cache(df: pd.DataFrame, cache_path: Path) -> None:
+    # пишем во временный файл и переименовываем — параллельный скрипт
+    # не прочитает недописанный кэш
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp_path, compression="zstd", index=False)
+    except ImportError:
+        print("[WARN] pyarrow не установлен — кэш не сохранён, в следующий раз снова XML")
+    else:
+        tmp_path.replace(cache_path)
+
+
+def is_fresh(xml_path: Path = EXPORT_XML, cache_path: Path = CACHE_FILE) -> bool:
+    """Кэш есть и не старше export.xml — XML ради Record читать не нужно."""
+    return cache_path.exists() and cache_path.stat().st_mtime >= xml_path.stat().st_mtime
+
+
+def load_records(
+    xml_path: Path = EXPORT_XML,
+    cache_path: Path = CACHE_FILE,
+    columns: list | None = None,
+) -> pd.DataFrame:
+    """
+    Все <Record> из export.xml как DataFrame (columns — только нужные колонки).
+
+    Первый запуск разбирает XML и кладёт рядом Parquet (zstd); дальше,
+    пока кэш не старше export.xml, читаем только его.
+    """
+    if is_fresh(xml_path, cache_path):
+        return pd.read_parquet(cache_path, columns=columns)
+
+    workers = os.cpu_count() or 1
+    if workers > 1 and xml_path.stat().st_size >= PARALLEL_MIN_BYTES:
+        df = build_records_parallel(xml_path, workers)
+    else:
+        df = build_records(xml_path)
+    save_cache(df, cache_path)
+    return df if columns is None else df[columns]
+
+
+def workouts_schema(types, attrs: list, stats=None) -> str:
+    """Ключ набора load_workouts: хэш типов, атрибутов и запасных статистик."""
+    stats = stats or {}
+    key = repr((sorted(types), list(attrs), [(name, sorted(stats[name])) for name in sorted(stats)]))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def load_workouts(
+    name: str,
+    types,
+    attrs: list,
+    stats=None,
+    xml_path: Path = EXPORT_XML,
+) -> pd.DataFrame:
+    """
+    Сырые колонки нужных <Workout> (read_workout_columns) как DataFrame.
+
+    Кэш — свой на каждый набор (name) типов, атрибутов и запасных статистик
+    stats. Правило то же, что у load_records: пока Parquet не старше
+    export.xml, XML не читаем. Ключ набора (workouts_schema) лежит в
+    метаданных Parquet: если скрипт поменял типы / атрибуты / stats,
+    а имя осталось прежним, старый кэш не подходит и собирается заново.
+    """
+    cache_path = CACHE_FILE.with_name(f".export_cache.{name}.parquet")
+    schema = workouts_schema(types, attrs, stats)
+    columns = list(attrs)
+    for stat_name in stats or {}:
+        columns += [f"{stat_name}_sum", f"{stat_name}_unit"]
+
+    if is_fresh(xml_path, cache_path):
+        df = pd.read_parquet(cache_path)
+        if df.attrs.get("schema") == schema and list(df.columns) == columns:
+            return df
+
+    df = pd.DataFrame(read_workout_columns(xml_path, types, attrs, stats), columns=columns)
+    # pandas хранит attrs в метаданных Parquet и возвращает их при чтении
+    df.attrs["schema"] = schema
+    save_cache(df, cache_path)
+    return df
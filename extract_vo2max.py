@@ -1,22 +1,25 @@
 from pathlib import Path
-from lxml import etree as ET
 import datetime as dt
+
 import pandas as pd
-import sys
-import time
+from xlsxwriter import Workbook
 
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from openpyxl.chart import LineChart, Reference
+from cache import load_records
+from output_dir import report_path
 
 EXPORT_XML = Path("export.xml")
 CUTOFF_DATE = dt.date(2025, 8, 10)  # только с 10.08.2025 и новее
+CUTOFF_STR = CUTOFF_DATE.isoformat()  # "2025-08-10" — сравниваем с префиксом startDate
+
+VO2_TYPE = "HKQuantityTypeIdentifierVO2Max"
+
+MONTHS_SHEET = "VO2max by month"
+CHART_SHEET = "VO2max Chart"
 
 
-def parse_dt(s: str) -> dt.datetime:
-    # Формат Apple: "2025-11-28 06:18:00 +0100"
-    return dt.datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
+def parse_date(s: str) -> dt.date:
+    # Формат Apple: "2025-11-28 06:18:00 +0100", нужна только дата
+    return dt.date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
 
 
 def format_vo2(value: float) -> str:
@@ -26,84 +29,49 @@ def format_vo2(value: float) -> str:
     return s
 
 
-def extract_vo2_since_cutoff():
-    """Стримим export.xml и вытаскиваем VO2max записи >= CUTOFF_DATE."""
-    rows = []
+def collect(elem, best: dict) -> None:
+    """Колбэк на один <Record> VO2max: держит в best максимум за день (только с CUTOFF_DATE)."""
+    sd = elem.get("startDate")
+    # ISO-даты сравниваются как строки — старые записи отсекаем без разбора даты
+    if sd[:10] < CUTOFF_STR:
+        return
+
+    vo2 = float(elem.get("value"))  # уже ml/kg/min
+    d = parse_date(sd)
+    cur = best.get(d)
+    if cur is None or vo2 > cur:
+        best[d] = vo2
 
+
+def extract_vo2_since_cutoff():
+    """VO2max (max/day) >= CUTOFF_DATE из кэша записей: [(date, vo2)] по дате."""
     if not EXPORT_XML.exists():
         raise FileNotFoundError(f"{EXPORT_XML} не найден")
 
     print(f"Читаю {EXPORT_XML} …")
     print(f"Берём записи начиная с: {CUTOFF_DATE}")
 
-    context = ET.iterparse(str(EXPORT_XML), events=("end",), tag="Record")
-
-    processed = 0
-    found = 0
-    spinner = ["|", "/", "-", "\\"]
-    start_time = time.time()
-
-    for _, elem in context:
-        processed += 1
-
-        # Обновляем статус каждые 100k элементов
-        if processed % 100000 == 0:
-            elapsed = time.time() - start_time
-            speed = processed / elapsed if elapsed > 0 else 0
-            spin = spinner[(processed // 100000) % 4]
-            sys.stdout.write(
-                f"\r{spin} Обработано: {processed:,} | VO2max найдено: {found:,} | ~{speed:,.0f}/сек"
-            )
-            sys.stdout.flush()
-
-        if elem.get("type") == "HKQuantityTypeIdentifierVO2Max":
-            found += 1
+    records = load_records(EXPORT_XML, columns=["type", "startDate", "value"])
+    vo2 = records[
+        (records["type"] == VO2_TYPE)
+        & (records["startDate"] >= pd.Timestamp(CUTOFF_DATE))
+    ]
+    print(f"✓ VO2max найдено: {len(vo2):,}")
 
-            val_str = elem.get("value")
-            vo2 = float(val_str)  # уже ml/kg/min
+    best = vo2.groupby(vo2["startDate"].dt.date)["value"].max()
+    return list(zip(best.index, best.tolist()))
 
-            dt_start = parse_dt(elem.get("startDate"))
-            d = dt_start.date()
 
-            if d >= CUTOFF_DATE:
-                rows.append((d, vo2))
-
-        elem.clear()
-
-    del context
-
-    elapsed = time.time() - start_time
-    sys.stdout.write(
-        f"\r✓ Готово. Обработано: {processed:,} | VO2max найдено: {found:,} | Время: {elapsed:.1f} c\n"
-    )
-    sys.stdout.flush()
-
-    return rows
-
-
-def main():
-    rows = extract_vo2_since_cutoff()
-
-    if not rows:
+def report(daily) -> None:
+    """Печатает VO2max (max/day) по месяцам и сохраняет xlsx с графиком. daily — [(date, vo2)] по дате."""
+    if not daily:
         print("Не найдено VO2max после 2025-08-10")
         return
 
-    # В DataFrame для удобства группировки
-    df = pd.DataFrame(rows, columns=["Date", "VO2max"])
-    df = df.sort_values("Date")
-
-    daily = (
-        df.groupby("Date", as_index=False)["VO2max"]
-        .max()
-        .sort_values("Date")
-    )
-
     print("\nVO₂max (max/day) по месяцам:\n")
 
     current_month = None
-    for _, row in daily.iterrows():
-        d = row["Date"]
-        v = row["VO2max"]
+    for d, v in daily:
         key = (d.year, d.month)
 
         if key != current_month:
@@ -114,94 +82,80 @@ def main():
 
         print(f"{d}  {format_vo2(v)}")
 
-    out_xlsx = "vo2max_history_daily.xlsx"
-    wb = Workbook()
+    out_xlsx = report_path("vo2max_history_daily.xlsx")
+    # constant_memory: каждая строка сбрасывается на диск сразу после записи,
+    # поэтому оба листа пишем строго сверху вниз
+    wb = Workbook(str(out_xlsx), {"constant_memory": True})
+
+    # форматы — по одному на книгу, не на ячейку
+    bold = wb.add_format({"bold": True})
+    date_fmt = wb.add_format({"num_format": "yyyy-mm-dd"})
+    vo2_fmt = wb.add_format({"num_format": "0.00"})
 
-    ws_months = wb.active
-    ws_months.title = "VO2max by month"
+    ws_months = wb.add_worksheet(MONTHS_SHEET)
 
     monthly = {}
-    for _, r in daily.iterrows():
-        d = r["Date"]
-        v = float(r["VO2max"])
+    for d, v in daily:
         key = (d.year, d.month)
         monthly.setdefault(key, []).append((d, v))
 
     month_keys = sorted(monthly.keys())
 
-    col_idx = 1
-
-    for (year, month) in month_keys:
-        dates_vo2 = monthly[(year, month)]
-        month_label = f"{year}-{month:02d}"
-
-        col_date = col_idx
-        col_vo2 = col_idx + 1
-
-        col_letter_date = get_column_letter(col_date)
-        col_letter_vo2 = get_column_letter(col_vo2)
-
-        cell_month = ws_months.cell(row=1, column=col_date, value=month_label)
-        cell_month.font = Font(bold=True)
-
-        ws_months.cell(row=2, column=col_date, value="Date").font = Font(bold=True)
-        ws_months.cell(row=2, column=col_vo2, value="VO2max").font = Font(bold=True)
-
-        row_idx = 3
-        for d, v in dates_vo2:
-            c_date = ws_months.cell(row=row_idx, column=col_date, value=d)
-            c_date.number_format = "yyyy-mm-dd"
-
-            c_vo2 = ws_months.cell(row=row_idx, column=col_vo2, value=v)
-            c_vo2.number_format = "0.00"
-
-            row_idx += 1
-
-        ws_months.column_dimensions[col_letter_date].width = 12
-        ws_months.column_dimensions[col_letter_vo2].width = 10
-
-        col_idx += 3
-
-    ws_chart = wb.create_sheet(title="VO2max Chart")
-
-    ws_chart["A1"] = "Date"
-    ws_chart["B1"] = "VO2max"
-    ws_chart["A1"].font = Font(bold=True)
-    ws_chart["B1"].font = Font(bold=True)
-
-    row_idx = 2
-    for _, r in daily.iterrows():
-        d = r["Date"]
-        v = float(r["VO2max"])
-
-        c_date = ws_chart.cell(row=row_idx, column=1, value=d)
-        c_date.number_format = "yyyy-mm-dd"
-
-        c_vo2 = ws_chart.cell(row=row_idx, column=2, value=v)
-        c_vo2.number_format = "0.00"
-
-        row_idx += 1
-
-    max_row = row_idx - 1
-
-    ws_chart.column_dimensions["A"].width = 12
-    ws_chart.column_dimensions["B"].width = 10
-
-    chart = LineChart()
-    chart.title = "VO2max over time"
-    chart.y_axis.title = "ml/kg/min"
-    chart.x_axis.title = "Date"
-    chart.x_axis.number_format = "yyyy-mm-dd"
-
-    data = Reference(ws_chart, min_col=2, min_row=1, max_row=max_row)
-    cats = Reference(ws_chart, min_col=1, min_row=2, max_row=max_row)
-    chart.add_data(data, titles_from_data=True)
-    chart.set_categories(cats)
+    # каждый месяц — блок из трёх колонок (Date, VO2max, пустая)
+    for i, (year, month) in enumerate(month_keys):
+        c0 = i * 3
+        ws_months.set_column(c0, c0, 12)
+        ws_months.set_column(c0 + 1, c0 + 1, 10)
+        ws_months.write_string(0, c0, f"{year}-{month:02d}", bold)
+
+    for i in range(len(month_keys)):
+        c0 = i * 3
+        ws_months.write_string(1, c0, "Date", bold)
+        ws_months.write_string(1, c0 + 1, "VO2max", bold)
+
+    # строки собираем поперёк блоков: row за row, как того требует constant_memory
+    max_days = max(len(v) for v in monthly.values())
+    for row_idx in range(max_days):
+        r = row_idx + 2
+        for i, key in enumerate(month_keys):
+            dates_vo2 = monthly[key]
+            if row_idx < len(dates_vo2):
+                d, v = dates_vo2[row_idx]
+                ws_months.write_datetime(r, i * 3, d, date_fmt)
+                ws_months.write_number(r, i * 3 + 1, v, vo2_fmt)
+
+    ws_chart = wb.add_worksheet(CHART_SHEET)
+
+    ws_chart.set_column(0, 0, 12)
+    ws_chart.set_column(1, 1, 10)
+
+    ws_chart.write_string(0, 0, "Date", bold)
+    ws_chart.write_string(0, 1, "VO2max", bold)
+    for r, (d, v) in enumerate(daily, start=1):
+        ws_chart.write_datetime(r, 0, d, date_fmt)
+        ws_chart.write_number(r, 1, v, vo2_fmt)
+
+    last_row = len(daily)
+
+    chart = wb.add_chart({"type": "line"})
+    chart.add_series({
+        "name": [CHART_SHEET, 0, 1],
+        "categories": [CHART_SHEET, 1, 0, last_row, 0],
+        "values": [CHART_SHEET, 1, 1, last_row, 1],
+    })
+    chart.set_title({"name": "VO2max over time"})
+    chart.set_y_axis({"name": "ml/kg/min"})
+    chart.set_x_axis({"name": "Date", "num_format": "yyyy-mm-dd"})
+
+    ws_chart.insert_chart("D2", chart)
+
+    wb.close()
+    print(f"\nСохранено → {out_xlsx}")
 
-    ws_chart.add_chart(chart, "D2")
 
-    wb.save(out_xlsx)
-    print(f"\nСохранено → {out_xlsx}")
+def main():
+    daily = extract_vo2_since_cutoff()
+    report(daily)
 
 
 if __name__ == "__main__":
@@ -1,96 +1,125 @@
 from pathlib import Path
-from lxml import etree as ET
 import datetime as dt
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
 
+from cache import load_records, to_datetime, to_floats
+from output_dir import report_path
+
 XML_FILE = Path("export.xml")
 START_DATE = dt.date(2025, 8, 10)
+START_STR = START_DATE.isoformat()  # сравниваем с префиксом startDate
+
+WEIGHT_TYPE = "HKQuantityTypeIdentifierBodyMass"
+VO2_TYPE = "HKQuantityTypeIdentifierVO2Max"
+# записи, которые собираем: вес и VO2max
+RECORD_TYPES = {WEIGHT_TYPE, VO2_TYPE}
+# атрибуты Record, которые собирает collect
+RECORD_ATTRS = ["type", "startDate", "value"]
+
+# один шрифт на все ячейки листа
+CELL_FONT = Font(size=22)
 
 
 def output_filename():
     now = dt.datetime.now().strftime("%Y%m%d_%H%M")
-    return f"weight_vo2_history_{now}.xlsx"
+    return report_path(f"weight_vo2_history_{now}.xlsx")
 
 
-def parse_dt(s: str) -> dt.datetime:
-    # "2025-11-30 12:51:18 +0100" -> datetime
-    return dt.datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
+def record_columns() -> dict:
+    """Пустые колонки для collect (сырые строки)."""
+    return {name: [] for name in RECORD_ATTRS}
 
 
-def parse_export(xml_path: Path):
-    weight_rows = []
-    vo2_rows = []
+def collect(elem, cols: dict) -> None:
+    """
+    Колбэк на один <Record> веса / VO2max (только с START_DATE): сырые
+    атрибуты, пересчёт и агрегация — в aggregate_daily, как и для кэша.
+    """
+    get = elem.get
+    # ISO-даты сравниваются как строки — без разбора даты
+    start = get("startDate")
+    if not start or start[:10] < START_STR:
+        return
 
-    print("Читаю XML:", xml_path.name)
-    context = ET.iterparse(str(xml_path), events=("end",), tag="Record")
+    for name in RECORD_ATTRS:
+        cols[name].append(get(name))
 
-    for _, elem in tqdm(context, desc="Парсинг", unit="rec"):
-        r_type = elem.get("type")
-        value = elem.get("value")
-        start = elem.get("startDate")
 
-        try:
-            val_float = float(value)
-        except Exception:
-            elem.clear()
-            continue
-
-        dt_start = parse_dt(start)
-        if dt_start.date() < START_DATE:
-            elem.clear()
-            continue
+def records_frame(cols: dict) -> pd.DataFrame:
+    """Колонки collect -> таблица записей в типах кэша (startDate — datetime, value — float)."""
+    return pd.DataFrame(
+        {
+            "type": pd.Series(cols["type"], dtype=object),
+            "startDate": to_datetime(cols["startDate"]),
+            "value": to_floats(cols["value"]),
+        }
+    )
 
-        if r_type == "HKQuantityTypeIdentifierBodyMass":
-            weight_rows.append((dt_start.date(), val_float))
-        elif r_type == "HKQuantityTypeIdentifierVO2Max":
-            vo2_rows.append((dt_start.date(), val_float))
 
-        elem.clear()
+def aggregate_daily(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Средний вес и максимальный VO2max по дням (с START_DATE) — одна таблица
+    по объединению дат. records: type, startDate (datetime), value (float).
+    """
+    rows = records[
+        records["type"].isin(RECORD_TYPES)
+        & (records["startDate"] >= pd.Timestamp(START_DATE))
+        & records["value"].notna()
+    ]
+    dates = rows["startDate"].dt.date
+    is_weight = rows["type"] == WEIGHT_TYPE
+    is_vo2 = rows["type"] == VO2_TYPE
 
-    del context
-    return (
-        pd.DataFrame(weight_rows, columns=["date", "weight_kg"]),
-        pd.DataFrame(vo2_rows, columns=["date", "vo2max"]),
-    )
+    weight = rows["value"][is_weight].groupby(dates[is_weight]).mean()
+    vo2 = rows["value"][is_vo2].groupby(dates[is_vo2]).max()
 
+    daily = pd.concat({"weight_kg": weight, "vo2max": vo2}, axis=1).sort_index()
+    return daily.rename_axis("date").reset_index()
 
-def aggregate_daily(df_weight, df_vo2):
-    df_w = df_weight.groupby("date", as_index=False)["weight_kg"].mean()
-    df_v = df_vo2.groupby("date", as_index=False)["vo2max"].max()
 
-    daily = (
-        pd.merge(df_w, df_v, on="date", how="outer")
-        .sort_values("date")
-        .reset_index(drop=True)
-    )
-    return daily
+def parse_export(xml_path: Path) -> pd.DataFrame:
+    print("Читаю записи:", xml_path.name)
+    records = load_records(xml_path, columns=RECORD_ATTRS)
+    # тип, дата и агрегация по дням — векторно по всей таблице, без цикла по записям
+    return aggregate_daily(records)
 
 
 def add_metrics(daily: pd.DataFrame):
-    daily["date"] = pd.to_datetime(daily["date"], errors="coerce")
+    # всё считаем на numpy-массивах: стартовые значения — скаляры, без промежуточных Series
+    dates = daily["date"].to_numpy(dtype="datetime64[D]")
+    daily["date"] = dates
+    daily["days_from_start"] = (dates - dates[0]).astype(np.int64)
 
-    daily["days_from_start"] = (daily["date"] - daily["date"].iloc[0]).dt.days
+    w = daily["weight_kg"].to_numpy(dtype=np.float64)
+    v = daily["vo2max"].to_numpy(dtype=np.float64)
 
-    start_weight = daily["weight_kg"].dropna().iloc[0]
-    start_vo2 = daily["vo2max"].dropna().iloc[0]
+    start_weight = w[~np.isnan(w)][0]
+    start_vo2 = v[~np.isnan(v)][0]
 
-    daily["weight_delta_kg_from_start"] = daily["weight_kg"] - start_weight
-    daily["vo2_delta_from_start"] = daily["vo2max"] - start_vo2
+    dw = w - start_weight
+    dv = v - start_vo2
+    daily["weight_delta_kg_from_start"] = dw
+    daily["vo2_delta_from_start"] = dv
 
-    daily["vo2_gain_per_kg_lost"] = np.where(
-        (daily["weight_delta_kg_from_start"] < 0)
-        & daily["vo2_delta_from_start"].notna(),
-        daily["vo2_delta_from_start"] / (-daily["weight_delta_kg_from_start"]),
-        np.nan,
-    )
+    gain = np.full_like(dv, np.nan)
+    mask = (dw < 0) & ~np.isnan(dv)
+    gain[mask] = dv[mask] / -dw[mask]
+    daily["vo2_gain_per_kg_lost"] = gain
 
     return daily
 
 
+def font_cell(ws, value) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.font = CELL_FONT
+    return cell
+
+
 def save_excel(daily: pd.DataFrame):
     cols = [
         "date",
@@ -132,41 +161,53 @@ def save_excel(daily: pd.DataFrame):
     out_name = output_filename()
     print("Сохраняю в Excel:", out_name)
 
-    with pd.ExcelWriter(out_name, engine="openpyxl") as writer:
-        final.to_excel(writer, sheet_name="Weight_vs_VO2", index=False)
-        ws = writer.sheets["Weight_vs_VO2"]
-
-        ws.freeze_panes = "A2"
-
-        for cell in ws["A"][1:]:
-            if cell.value:
-                cell.number_format = "mm/dd/yyyy"
-
-        for col_idx, column in enumerate(ws.columns, start=1):
-            max_len = 0
-            for cell in column:
-                cell.font = Font(size=22)
-
-                val = cell.value
-                if val is None:
-                    continue
-                if isinstance(val, dt.datetime):
-                    text = val.strftime("%m/%d/%Y")
-                else:
-                    text = str(val)
-                if len(text) > max_len:
-                    max_len = len(text)
+    # значения готовим заранее и тут же считаем ширину колонок — один проход,
+    # без обхода ws.columns
+    widths = [len(str(c)) for c in final.columns]
+    rows = []
+    for rec in final.itertuples(index=False, name=None):
+        row = []
+        for j, val in enumerate(rec):
+            if isinstance(val, pd.Timestamp):
+                val = val.to_pydatetime()
+                text = val.strftime("%m/%d/%Y")
+            elif pd.isna(val):
+                val = None
+                text = ""
+            else:
+                text = str(val)
+            if len(text) > widths[j]:
+                widths[j] = len(text)
+            row.append(val)
+        rows.append(row)
+
+    # write-only: ячейки не трекаются, шрифт — один объект на все
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Weight_vs_VO2")
+
+    ws.freeze_panes = "A2"
+    for col_idx, max_len in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = max_len * 1.4 + 6
+
+    ws.append([font_cell(ws, c) for c in final.columns])
+    for row in rows:
+        cells = [font_cell(ws, val) for val in row]
+        if row[0]:
+            cells[0].number_format = "mm/dd/yyyy"
+        ws.append(cells)
+
+    wb.save(out_name)
+
+
+def report(daily: pd.DataFrame) -> None:
+    daily = add_metrics(daily)
+    print("Строк после агрегации:", len(daily))
+    save_excel(daily)
 
-            width = max_len * 1.4 + 6
-            ws.column_dimensions[get_column_letter(col_idx)].width = width
 
 def main():
     print("Стартовая дата:", START_DATE)
-    df_weight, df_vo2 = parse_export(XML_FILE)
-    daily = aggregate_daily(df_weight, df_vo2)
-    daily = add_metrics(daily)
-    print("Строк после агрегации:", len(daily))
-    save_excel(daily)
+    report(parse_export(XML_FILE))
     print("Готово.")
 
 
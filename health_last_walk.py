@@ -2,11 +2,17 @@ from pathlib import Path
 import sys
 import datetime as dt
 
-import pandas as pd
-from lxml import etree as ET
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill
 
+from health_xml import open_records, free, iter_from_end
+from cache import load_records, source_contains
+from output_dir import report_path
+from _kernels import zone_seconds, split_mean_hr
+
 
 EXPORT_XML = Path("export.xml")
 
@@ -18,90 +24,157 @@ ZONES = [
     ("Zone 4", 150, 169),
     ("Zone 5", 170, 10_000),
 ]
+# границы зон (включительно) — для ядра zone_seconds
+ZONE_LOWER = np.array([lo for _, lo, _ in ZONES], dtype=np.float64)
+ZONE_UPPER = np.array([hi for _, _, hi in ZONES], dtype=np.float64)
 
 # Берём только записи с часов (как в других скриптах)
 PRIMARY_DEVICE_MARK = "Watch"
 
-
-def is_watch_source(elem: ET._Element) -> bool:
-    """
-    Источник — Apple Watch (по sourceName/device, с учётом NBSP).
-    """
-    src = (elem.get("sourceName") or "") + " " + (elem.get("device") or "")
-    src = src.replace("\u00a0", " ")
-    return PRIMARY_DEVICE_MARK in src
+# по этой строке ищем Walking-тренировки с конца файла
+WALKING_MARKER = b'workoutActivityType="HKWorkoutActivityTypeWalking"'
+
+HR_TYPE = "HKQuantityTypeIdentifierHeartRate"
+DIST_TYPES = {
+    "HKQuantityTypeIdentifierDistanceWalkingRunning",
+    "HKQuantityTypeIdentifierDistanceWalking",
+}
+
+SPLIT_COLUMNS = ["KM", "Time", "Pace", "Heart Rate"]
+
+# Стили создаём один раз, а не на каждую ячейку
+BIG_FONT = Font(size=28)
+HDR_FONT = Font(size=28, bold=True)
+
+# Цвета в стиле Apple Fitness (без чёрного фона)
+YELLOW_FILL = PatternFill(start_color="FFFFD60A", end_color="FFFFD60A", fill_type="solid")
+TEAL_FILL = PatternFill(start_color="FF40C8E0", end_color="FF40C8E0", fill_type="solid")
+RED_FILL = PatternFill(start_color="FFFF375F", end_color="FFFF375F", fill_type="solid")
+GREEN_FILL = PatternFill(start_color="FF30D158", end_color="FF30D158", fill_type="solid")
+ORANGE_FILL = PatternFill(start_color="FFFF453A", end_color="FFFF453A", fill_type="solid")
+
+# Левый блок метрик — цвет значения в колонке B
+METRICS_COLORS = {
+    "Workout Time": YELLOW_FILL,
+    "Elapsed Time": YELLOW_FILL,
+    "Active Kilocalories": RED_FILL,
+    "Total Kilocalories": RED_FILL,
+    "Avg. Pace": TEAL_FILL,
+    "Distance": TEAL_FILL,
+    "Elevation Gain": GREEN_FILL,
+    "Avg. Heart Rate": ORANGE_FILL,
+}
+# Правый блок — сплиты: Time / Pace / Heart Rate
+SPLIT_FILLS = [YELLOW_FILL, TEAL_FILL, ORANGE_FILL]
 
 
 def parse_apple_datetime(s: str) -> dt.datetime:
-    # формат: '2021-09-13 14:40:55 +0100'
-    return dt.datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
+    # формат: '2021-09-13 14:40:55 +0100'; срезы в разы быстрее strptime
+    return dt.datetime(
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[14:16]), int(s[17:19]),
+    )
+
+
+def workout_info(elem) -> dict:
+    """duration, kcal, дистанция и набор высоты из элемента <Workout>."""
+    duration_min = float(elem.get("duration", "0"))
+
+    active_kcal = None
+    basal_kcal = None
+    distance = None
+    distance_unit = None
+    elevation_m = None
+
+    for child in elem:
+        if child.tag == "WorkoutStatistics":
+            stype = child.get("type")
+            if stype == "HKQuantityTypeIdentifierActiveEnergyBurned":
+                active_kcal = float(child.get("sum", "0"))
+            elif stype == "HKQuantityTypeIdentifierBasalEnergyBurned":
+                basal_kcal = float(child.get("sum", "0"))
+            elif stype == "HKQuantityTypeIdentifierDistanceWalkingRunning":
+                distance = float(child.get("sum", "0"))
+                distance_unit = child.get("unit")
+        elif child.tag == "MetadataEntry":
+            key = child.get("key")
+            if key == "HKElevationAscended":
+                val = child.get("value") or "0"
+                num = val.split()[0]
+                try:
+                    elevation_m = float(num) / 100.0  # см → м
+                except ValueError:
+                    elevation_m = None
+
+    return {
+        "start": parse_apple_datetime(elem.get("startDate")),
+        "end": parse_apple_datetime(elem.get("endDate")),
+        "duration_min": duration_min,
+        "active_kcal": active_kcal,
+        "basal_kcal": basal_kcal,
+        "distance": distance,
+        "distance_unit": distance_unit,
+        "elevation_m": elevation_m,
+    }
 
 
-def find_last_walking_workout(target_date: dt.date | None = None):
+def scan_walking_workouts(target_date: dt.date | None = None):
     """
-    Находим последнюю Walking-тренировку и
-    сразу берём duration, kcal, дистанцию, набор высоты.
+    Полный проход iterparse по всем Workout — запасной путь, если
+    поиск с конца файла ничего не дал.
     """
     last_start = None
     best = None
 
-    context = ET.iterparse(str(EXPORT_XML), events=("end",), tag="Workout")
+    context = open_records(EXPORT_XML, "Workout")
     for _, elem in context:
         wtype = elem.get("workoutActivityType")
         if wtype == "HKWorkoutActivityTypeWalking":
             start = parse_apple_datetime(elem.get("startDate"))
-            end = parse_apple_datetime(elem.get("endDate"))
 
             # Если задана конкретная дата, берём только тренировки этого дня
             if target_date is not None and start.date() != target_date:
-                elem.clear()
+                free(elem)
                 continue
 
             if last_start is None or start > last_start:
                 last_start = start
+                best = workout_info(elem)
 
-                duration_min = float(elem.get("duration", "0"))
-
-                active_kcal = None
-                basal_kcal = None
-                distance = None
-                distance_unit = None
-                elevation_m = None
-
-                for child in elem:
-                    if child.tag == "WorkoutStatistics":
-                        stype = child.get("type")
-                        if stype == "HKQuantityTypeIdentifierActiveEnergyBurned":
-                            active_kcal = float(child.get("sum", "0"))
-                        elif stype == "HKQuantityTypeIdentifierBasalEnergyBurned":
-                            basal_kcal = float(child.get("sum", "0"))
-                        elif stype == "HKQuantityTypeIdentifierDistanceWalkingRunning":
-                            distance = float(child.get("sum", "0"))
-                            distance_unit = child.get("unit")
-                    elif child.tag == "MetadataEntry":
-                        key = child.get("key")
-                        if key == "HKElevationAscended":
-                            val = child.get("value") or "0"
-                            num = val.split()[0]
-                            try:
-                                elevation_m = float(num) / 100.0  # см → м
-                            except ValueError:
-                                elevation_m = None
-
-                best = {
-                    "start": start,
-                    "end": end,
-                    "duration_min": duration_min,
-                    "active_kcal": active_kcal,
-                    "basal_kcal": basal_kcal,
-                    "distance": distance,
-                    "distance_unit": distance_unit,
-                    "elevation_m": elevation_m,
-                }
-
-        elem.clear()
+        free(elem)
     del context
 
+    return best
+
+
+def find_last_walking_workout(target_date: dt.date | None = None):
+    """
+    Находим последнюю Walking-тренировку и
+    сразу берём duration, kcal, дистанцию, набор высоты.
+
+    Workout в экспорте идут по времени и лежат в конце файла, поэтому
+    сначала ищем с конца (iter_from_end): без даты хватает первой
+    найденной, с датой — идём назад, пока не уйдём раньше нужного дня.
+    """
+    target_str = target_date.isoformat() if target_date is not None else None
+    best = None
+
+    for elem in iter_from_end(EXPORT_XML, "Workout", WALKING_MARKER):
+        start_str = elem.get("startDate")
+        day = start_str[:10]
+        if target_str is not None:
+            if day > target_str:
+                continue
+            if day < target_str:
+                break
+        if best is None or parse_apple_datetime(start_str) > best["start"]:
+            best = workout_info(elem)
+        if target_str is None:
+            break
+
+    if best is None:
+        best = scan_walking_workouts(target_date)
+
     if best is None:
         if target_date is not None:
             raise RuntimeError(f"Walking-тренировок в export.xml не найдено для даты {target_date}")
@@ -130,95 +203,76 @@ def collect_hr_and_dist(start: dt.datetime, end: dt.datetime, total_dist_km: flo
 
     Теперь берём только записи с WATCH,
     чтобы не было дублей с айфона.
-    """
-    hr_samples = []              # (time, bpm)
-    dist_samples_raw = []        # (time, value_km)
-
-    context = ET.iterparse(str(EXPORT_XML), events=("end",), tag="Record")
-    for _, elem in context:
-        # фильтруем источник
-        if not is_watch_source(elem):
-            elem.clear()
-            continue
-
-        rtype = elem.get("type")
 
-        s = parse_apple_datetime(elem.get("startDate"))
-        e = parse_apple_datetime(elem.get("endDate"))
-
-        if e <= start or s >= end:
-            elem.clear()
-            continue
+    Оба набора массивов возвращаются уже отсортированными по времени —
+    compute_zones / compute_splits на это полагаются и повторно не сортируют.
+    """
+    records = load_records(
+        EXPORT_XML,
+        columns=["type", "startDate", "endDate", "value", "unit", "sourceName", "device"],
+    )
+
+    # тип и окно тренировки — векторно по всей таблице
+    rtype = records["type"]
+    in_window = records[
+        ((rtype == HR_TYPE) | rtype.isin(DIST_TYPES))
+        & (records["endDate"] > start)
+        & (records["startDate"] < end)
+    ]
 
-        if rtype == "HKQuantityTypeIdentifierHeartRate":
-            v = float(elem.get("value"))
-            hr_samples.append((s, v))
-
-        elif rtype in (
-            "HKQuantityTypeIdentifierDistanceWalkingRunning",
-            "HKQuantityTypeIdentifierDistanceWalking",
-        ):
-            v = float(elem.get("value"))
-            unit = elem.get("unit")
-            # Приводим к км
-            if unit == "mi":
-                v *= 1.60934
-            dist_samples_raw.append((e, v))
-
-        elem.clear()
-    del context
+    # фильтруем источник
+    in_window = in_window[source_contains(in_window, PRIMARY_DEVICE_MARK)]
 
-    if not hr_samples:
+    # время — сразу datetime64[s] из кэша, без Python datetime;
+    # пульс и дистанция — по паре параллельных массивов, отсортированных по времени
+    hr = in_window[in_window["type"] == HR_TYPE]
+    if hr.empty:
         raise RuntimeError("Не найдено данных по пульсу в интервале тренировки")
 
-    hr_samples.sort(key=lambda x: x[0])
-    dist_samples_raw.sort(key=lambda x: x[0])
-
-    # Если вдруг нет расстояний – вернём пустой список
-    if not dist_samples_raw:
-        return hr_samples, []
+    hr_t = hr["startDate"].to_numpy(dtype="datetime64[s]")
+    hr_v = hr["value"].to_numpy(dtype=np.float64)
+    order = np.argsort(hr_t, kind="stable")
+    hr_t, hr_v = hr_t[order], hr_v[order]
 
-    # Авто-определение delta / cumulative
-    vals = [v for _, v in dist_samples_raw]
-    max_val = max(vals)
-    sum_val = sum(vals)
+    dist = in_window[in_window["type"] != HR_TYPE]
+    # Приводим к км
+    dist_km = dist["value"].where(dist["unit"] != "mi", dist["value"] * 1.60934)
+    dist_t = dist["endDate"].to_numpy(dtype="datetime64[s]")
+    vals = dist_km.to_numpy(dtype=np.float64)
+    order = np.argsort(dist_t, kind="stable")
+    dist_t, vals = dist_t[order], vals[order]
 
-    diff_if_delta = abs(sum_val - total_dist_km)
-    diff_if_cum = abs(max_val - total_dist_km)
+    # Если вдруг нет расстояний – вернём пустые массивы
+    if not vals.size:
+        return (hr_t, hr_v), (dist_t, vals)
 
-    mode = "delta" if diff_if_delta <= diff_if_cum else "cumulative"
+    # Авто-определение delta / cumulative
+    diff_if_delta = abs(vals.sum() - total_dist_km)
+    diff_if_cum = abs(vals.max() - total_dist_km)
 
-    dist_samples = []
-    if mode == "delta":
-        cum = 0.0
-        for t, v in dist_samples_raw:
-            cum += v
-            dist_samples.append((t, cum))
+    if diff_if_delta <= diff_if_cum:  # delta
+        dist_km = np.cumsum(vals)
     else:  # cumulative
-        dist_samples = [(t, v) for t, v in dist_samples_raw]
+        dist_km = vals
 
-    return hr_samples, dist_samples
+    return (hr_t, hr_v), (dist_t, dist_km)
 
 
-def compute_avg_hr(hr_samples):
-    vals = [v for _, v in hr_samples]
-    return sum(vals) / len(vals)
+def compute_avg_hr(hr):
+    _, hrs = hr
+    return float(np.mean(hrs))
 
 
-def compute_zones(hr_samples):
-    zone_seconds = {name: 0 for name, _, _ in ZONES}
+def compute_zones(hr):
+    times, hrs = hr
 
-    for i in range(len(hr_samples) - 1):
-        t0, hr = hr_samples[i]
-        t1, _ = hr_samples[i + 1]
-        dt_sec = (t1 - t0).total_seconds()
-        for name, lo, hi in ZONES:
-            if lo <= hr <= hi:
-                zone_seconds[name] += dt_sec
-                break
+    # интервал до следующего замера относим к зоне текущего пульса
+    dts = np.diff(times) / np.timedelta64(1, "s")
+    zone_secs = np.zeros(len(ZONES))
+    zone_seconds(hrs[:-1], dts, ZONE_LOWER, ZONE_UPPER, zone_secs)
 
     zone_str = {}
-    for name, secs in zone_seconds.items():
+    for (name, _, _), secs in zip(ZONES, zone_secs):
         secs = int(secs)
         m, s = divmod(secs, 60)
         zone_str[name] = f"{m:02d}:{s:02d}"
@@ -242,84 +296,69 @@ def format_pace(duration: dt.timedelta, distance_km: float) -> str:
     return f"{m}'{s:02d}\"/KM"
 
 
-def autoformat_sheet(ws):
-    """Увеличиваем шрифт, выставляем ширину колонок по заголовкам
-    и красим основные метрики и сплиты в стиле Apple Fitness+.
+def styled_cell(ws, value, font: Font, fill: PatternFill | None = None) -> WriteOnlyCell:
+    # "" в таблице — пустая ячейка, но со шрифтом/цветом как у соседей
+    cell = WriteOnlyCell(ws, value=None if value == "" else value)
+    cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    return cell
+
+
+def save_sheet(out_name: Path, header: list, rows: list) -> None:
+    """Пишем лист потоково (write-only): крупный шрифт, ширина колонок по
+    самому длинному значению и цвета основных метрик и сплитов в стиле Apple Fitness+.
+    rows — строки A–G: левый блок метрик (A–C) и сплиты (D–G).
     """
-    # 1) Шрифт: заголовки жирные, всё остальное крупным шрифтом
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.row == 1:
-                cell.font = Font(size=28, bold=True)
-            else:
-                cell.font = Font(size=28)
-
-    # 2) Ширина колонок по максимальной длине текста во всей колонке
-    for col_cells in ws.columns:
-        max_len = 0
-        col_idx = col_cells[0].column
-
-        for cell in col_cells:
-            val = cell.value
+    ncols = len(header)
+
+    # 1) Ширина колонок — по значениям, один проход без обхода ячеек листа
+    widths = [0] * ncols
+    for row in [header] + rows:
+        for j, val in enumerate(row):
             if val is None:
                 continue
             length = len(str(val))
-            if length > max_len:
-                max_len = length
+            if length > widths[j]:
+                widths[j] = length
 
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Sheet1")
+
+    # в write-only закрепление и ширины задаются до первой строки
+    ws.freeze_panes = "A2"
+    for col_idx, max_len in enumerate(widths, start=1):
         if max_len == 0:
             continue
-
         # для шрифта 28 обычная "символьная" ширина узкая, поэтому
         # умножаем длину строки на коэффициент, чтобы текст точно влезал
-        adjusted_width = max_len * 2.0 + 4  # небольшой запас
-        ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
-
-    # 3) Цвета в стиле Apple Fitness (без чёрного фона)
-    yellow_fill = PatternFill(start_color="FFFFD60A", end_color="FFFFD60A", fill_type="solid")
-    teal_fill = PatternFill(start_color="FF40C8E0", end_color="FF40C8E0", fill_type="solid")
-    red_fill = PatternFill(start_color="FFFF375F", end_color="FFFF375F", fill_type="solid")
-    green_fill = PatternFill(start_color="FF30D158", end_color="FF30D158", fill_type="solid")
-    orange_fill = PatternFill(start_color="FFFF453A", end_color="FFFF453A", fill_type="solid")
-
-    # 3a) Левый блок метрик — красим значения в колонке B
-    metrics_colors = {
-        "Workout Time": yellow_fill,
-        "Elapsed Time": yellow_fill,
-        "Active Kilocalories": red_fill,
-        "Total Kilocalories": red_fill,
-        "Avg. Pace": teal_fill,
-        "Distance": teal_fill,
-        "Elevation Gain": green_fill,
-        "Avg. Heart Rate": orange_fill,
-    }
+        ws.column_dimensions[get_column_letter(col_idx)].width = max_len * 2.0 + 4
 
-    for row_idx in range(2, ws.max_row + 1):
-        label = ws[f"A{row_idx}"].value
-        if not label:
-            continue
-        fill = metrics_colors.get(str(label))
-        if fill is not None:
-            ws[f"B{row_idx}"].fill = fill
-
-    # 3б) Правый блок — сплиты: окрашиваем Time / Pace / Heart Rate
-    for row_idx in range(2, ws.max_row + 1):
-        km_val = ws[f"D{row_idx}"].value
-        if km_val is None:
-            continue
-        # Есть номер километра — считаем, что это строка со сплитом
-        ws[f"E{row_idx}"].fill = yellow_fill   # Time
-        ws[f"F{row_idx}"].fill = teal_fill     # Pace
-        ws[f"G{row_idx}"].fill = orange_fill   # Heart Rate
+    # 2) Шрифт: заголовки жирные, всё остальное крупным шрифтом
+    ws.append([styled_cell(ws, val, HDR_FONT) for val in header])
+
+    # 3) Цвета: значение метрики в колонке B, Time / Pace / Heart Rate у сплитов
+    for row in rows:
+        fills = [None] * ncols
+        fills[1] = METRICS_COLORS.get(row[0])
+        if row[3] is not None:
+            # Есть номер километра — считаем, что это строка со сплитом
+            fills[4:7] = SPLIT_FILLS
+        ws.append([styled_cell(ws, val, BIG_FONT, fill) for val, fill in zip(row, fills)])
+
+    wb.save(out_name)
 
 
-def compute_splits(hr_samples, dist_samples, start: dt.datetime, total_dist_km: float):
+def compute_splits(hr, dist_samples, start: dt.datetime, total_dist_km: float):
     """
     Строим сплиты:
       - по каждому полному километру (1,2,3,...)
       - + при необходимости последний неполный кусок
+    hr — (время datetime64[s], пульс), dist_samples — (время datetime64[s],
+    накопленные км) из collect_hr_and_dist.
     """
-    if not dist_samples:
+    dist_t, dist_km = dist_samples
+    if not dist_km.size:
         return []
 
     EPS = 0.05  # допуск по длине отрезка (50 м)
@@ -327,73 +366,62 @@ def compute_splits(hr_samples, dist_samples, start: dt.datetime, total_dist_km:
     # сколько полных километров считаем сплитами
     num_full = int(total_dist_km + EPS)  # для 12.01 -> 12
 
-    bounds = [k for k in range(1, num_full + 1)]
+    targets = np.arange(1, num_full + 1, dtype=np.float64)
 
     # если после этого остался заметный хвост (больше ~50 м) — добавим его как отдельный сплит
     leftover = total_dist_km - num_full
     if leftover > EPS:
-        bounds.append(total_dist_km)
+        targets = np.append(targets, total_dist_km)
 
-    if not bounds:
+    if not targets.size:
         return []
 
-    times = [t for t, _ in dist_samples]
-    dists = [d for _, d in dist_samples]
-
-    splits = []
-    prev_t = start
-    hr_samples_sorted = sorted(hr_samples, key=lambda x: x[0])
-
-    idx = 0
-    n = len(times)
-    prev_dist = 0.0
-
-    for i, target in enumerate(bounds, start=1):
-        # ищем участок, где cum_dist пересекает target
-        while idx < n and dists[idx] < target:
-            prev_t = times[idx]
-            prev_dist = dists[idx]
-            idx += 1
-        if idx == n:
-            break
-
-        cur_t = times[idx]
-        cur_dist = dists[idx]
-
-        # линейная интерполяция момента достижения нужной дистанции
-        if cur_dist == prev_dist:
-            t_target = cur_t
-        else:
-            frac = (target - prev_dist) / (cur_dist - prev_dist)
-            dt_sec = (cur_t - prev_t).total_seconds()
-            t_target = prev_t + dt.timedelta(seconds=dt_sec * frac)
+    # замеры с точкой (0 км, start) в начале; время — целые мкс от старта
+    start64 = np.datetime64(start, "us")
+    t_us = np.concatenate(([0], (dist_t.astype("datetime64[us]") - start64).view(np.int64)))
+    dvec = np.concatenate(([0.0], dist_km))
 
-        # границы сплита по времени
-        t_start_split = splits[-1]["_t_end"] if splits else start
-        t_end_split = t_target
+    # сплиты считаем только до реально пройденной дистанции
+    reach = np.maximum.accumulate(dvec)
+    targets = targets[targets <= reach[-1]]
+    if not targets.size:
+        return []
 
-        split_duration = t_end_split - t_start_split
-        sec = int(split_duration.total_seconds())
-        pace_min = sec // 60
-        pace_sec = sec % 60
+    # граница достигнута на первом замере, где дистанция >= границы (накопленный
+    # максимум неубывающий — searchsorted), и интерполируется от предыдущего замера,
+    # даже если дистанция перед этим проседала; np.interp по максимуму дал бы другое время
+    cur = np.searchsorted(reach, targets, side="left")
+    prev = cur - 1
+    frac = (targets - dvec[prev]) / (dvec[cur] - dvec[prev])
+    dt_sec = (t_us[cur] - t_us[prev]) / 1e6
+    offsets_us = t_us[prev] + np.rint(dt_sec * frac * 1e6).astype(np.int64)
+    # границы сплитов в datetime64[us]: start, конец 1-го, 2-го, ...
+    bounds = start64 + np.concatenate(([0], offsets_us)).astype("timedelta64[us]")
+
+    # средний пульс внутри каждого сплита [начало, конец] — одним проходом в ядре;
+    # hr_t уже отсортирован в collect_hr_and_dist, границы сплитов возрастают
+    hr_t, hr_v = hr
+    split_hr = np.zeros(targets.size)
+    split_mean_hr(hr_t.astype("datetime64[us]").view(np.int64), hr_v, bounds.view(np.int64), split_hr)
+
+    # длительность сплита в целых секундах — разность int64, без timedelta
+    split_secs = np.diff(bounds) // np.timedelta64(1, "s")
+    end_times = bounds[1:].astype(object)  # datetime — только для strftime
 
-        # средний пульс внутри сплита
-        hr_vals = [v for (t, v) in hr_samples_sorted if t_start_split <= t <= t_end_split]
-        avg_hr = int(round(sum(hr_vals) / len(hr_vals))) if hr_vals else 0
+    splits = []
+    for i, (t_end_split, sec, mean_hr) in enumerate(zip(end_times, split_secs.tolist(), split_hr), start=1):
+        pace_min, pace_sec = divmod(sec, 60)
+        avg_hr = int(round(mean_hr))
 
         splits.append(
             {
                 "KM": i,
-                "Time": t_target.strftime("%H:%M"),
+                "Time": t_end_split.strftime("%H:%M"),
                 "Pace": f"{pace_min}'{pace_sec:02d}\"/KM",
                 "Heart Rate": f"{avg_hr} BPM",
-                "_t_end": t_target,
             }
         )
 
-    for sp in splits:
-        sp.pop("_t_end", None)
-
     return splits
 
 
@@ -425,11 +453,11 @@ def main():
     print(f"Нашёл тренировку: {start} — {end}")
 
     print("Сбор пульса и дистанции…")
-    hr_samples, dist_samples = collect_hr_and_dist(start, end, distance_km)
+    hr, dist_samples = collect_hr_and_dist(start, end, distance_km)
 
-    avg_hr = compute_avg_hr(hr_samples)
-    zones = compute_zones(hr_samples)
-    splits = compute_splits(hr_samples, dist_samples, start, distance_km)
+    avg_hr = compute_avg_hr(hr)
+    zones = compute_zones(hr)
+    splits = compute_splits(hr, dist_samples, start, distance_km)
 
     avg_pace_str = format_pace(duration_td, distance_km)
 
@@ -456,21 +484,19 @@ def main():
             rng = f"{lo}–{hi} BPM"
         left_rows.append([name, zones[name], rng])
 
-    left_df = pd.DataFrame(left_rows, columns=[date_str, "", ""])
-
     # Правый блок – сплиты
-    if splits:
-        right_df = pd.DataFrame(splits, columns=["KM", "Time", "Pace", "Heart Rate"])
-    else:
-        right_df = pd.DataFrame(columns=["KM", "Time", "Pace", "Heart Rate"])
-
-    out_name = "full_last_walk.xlsx"
-    with pd.ExcelWriter(out_name, engine="openpyxl") as writer:
-        left_df.to_excel(writer, sheet_name="Sheet1", index=False, startrow=0, startcol=0)
-        right_df.to_excel(writer, sheet_name="Sheet1", index=False, startrow=0, startcol=3)
-        ws = writer.sheets["Sheet1"]
-        ws.freeze_panes = "A2"
-        autoformat_sheet(ws)
+    right_rows = [[sp[col] for col in SPLIT_COLUMNS] for sp in splits]
+
+    # склеиваем блоки построчно: A–C метрики, D–G сплиты
+    header = [date_str, "", ""] + SPLIT_COLUMNS
+    rows = []
+    for i in range(max(len(left_rows), len(right_rows))):
+        left = left_rows[i] if i < len(left_rows) else [None] * 3
+        right = right_rows[i] if i < len(right_rows) else [None] * len(SPLIT_COLUMNS)
+        rows.append(left + right)
+
+    out_name = report_path("full_last_walk.xlsx")
+    save_sheet(out_name, header, rows)
 
     print(f"Готово: {out_name}")
 
@@ -0,0 +1,314 @@
+from array import array
+from pathlib import Path
+import mmap
+
+from lxml import etree as ET
+
+# для отдельных фрагментов — те же ограничения, что и у iterparse
+FRAGMENT_PARSER = ET.XMLParser(
+    huge_tree=True,
+    remove_blank_text=True,
+    resolve_entities=False,
+    no_network=True,
+    load_dtd=False,
+)
+
+
+def open_records(path: Path, tags):
+    """
+    Потоковый разбор export.xml: отдаёт (event, elem) по закрытию тегов tags.
+
+    Файл читаем крупным буфером, DTD / сущности / сеть libxml2 не трогает,
+    huge_tree снимает лимиты на гигантские экспорты.
+    """
+    with open(path, "rb", buffering=1 << 20) as f:
+        yield from ET.iterparse(
+            f,
+            events=("end",),
+            tag=tags,
+            huge_tree=True,
+            remove_blank_text=True,
+            resolve_entities=False,
+            no_network=True,
+            load_dtd=False,
+        )
+
+
+def free(elem: ET._Element) -> None:
+    """
+    Освобождаем разобранный элемент.
+
+    Одного elem.clear() мало: пустые «скорлупки» остаются детьми <HealthData>,
+    и память растёт O(n). Поэтому удаляем и всех уже пройденных соседей.
+    """
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+
+def register(handlers: dict, keys, fn) -> None:
+    """Колбэк fn для parse_once на каждый type / workoutActivityType из keys."""
+    for key in keys:
+        handlers.setdefault(key, []).append(fn)
+
+
+def parse_once(xml_path: Path, handlers: dict) -> None:
+    """
+    Один проход по export.xml: каждый Record / Workout отдаём колбэкам,
+    зарегистрированным на его type / workoutActivityType.
+    """
+    context = open_records(xml_path, ("Record", "Workout"))
+    for _, elem in context:
+        if elem.tag == "Record":
+            key = elem.get("type")
+        else:
+            key = elem.get("workoutActivityType")
+
+        for fn in handlers.get(key, ()):
+            fn(elem)
+
+        free(elem)
+    del context
+
+
+def iter_from_end(path: Path, tag: str, marker: bytes):
+    """
+    Элементы <tag>, в которых встречается marker, — от конца файла к началу.
+
+    Файл целиком не разбираем: mmap + rfind по маркеру, затем границы
+    элемента (<tag ... > … </tag> или <tag .../>) и в lxml уходит только
+    этот фрагмент. Для того, что лежит в хвосте файла (Workout), это
+    десятки килобайт вместо всего экспорта.
+    """
+    open_tag = b"<" + tag.encode() + b" "
+    close_tag = b"</" + tag.encode() + b">"
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = len(mm)
+        while True:
+            idx = mm.rfind(marker, 0, pos)
+            if idx < 0:
+                return
+            start = mm.rfind(open_tag, 0, idx)
+            if start < 0:
+                return
+
+            head_end = mm.find(b">", idx)
+            if head_end < 0:
+                return
+            if mm[head_end - 1] == ord("/"):
+                end = head_end + 1
+            else:
+                end = mm.find(close_tag, head_end)
+                if end < 0:
+                    return
+                end += len(close_tag)
+
+            # маркер мог оказаться не в открывающем теге ближайшего <tag> —
+            # тогда просто ищем следующий
+            if mm.find(b">", start) >= idx:
+                yield ET.fromstring(mm[start:end], FRAGMENT_PARSER)
+                pos = start
+            else:
+                pos = idx
+
+
+def first_statistics(elem: ET._Element, stat_types) -> tuple:
+    """(sum, unit) первой WorkoutStatistics из stat_types с числовым sum, иначе (None, None)."""
+    for ws in elem.iterchildren("WorkoutStatistics"):
+        if ws.get("type") in stat_types:
+            s = ws.get("sum")
+            try:
+                float(s)
+            except (TypeError, ValueError):
+                continue
+            return s, ws.get("unit")
+    return None, None
+
+
+def fallback_statistics(elem: ET._Element, value, stat_types) -> tuple:
+    """
+    first_statistics, только если value (totalDistance) не число: у большинства
+    тренировок дистанция уже в атрибуте, и детей Workout не обходим вовсе.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return first_statistics(elem, stat_types)
+    # "nan" тоже не дистанция — как NaN у to_floats в пересчёте по колонкам
+    if number != number:
+        return first_statistics(elem, stat_types)
+    return None, None
+
+
+class WorkoutColumns:
+    """
+    target для lxml.etree.XMLParser: дерево не строится вовсе, атрибуты attrs
+    нужных <Workout> (workoutActivityType из types) сразу складываются
+    в списки-колонки.
+
+    Запасные дистанции — stats {имя: типы WorkoutStatistics}, на каждое имя
+    колонки {имя}_sum / {имя}_unit: то же, что first_statistics(), то есть
+    только прямые дети-WorkoutStatistics (статистики сегментов внутри
+    <WorkoutActivity> не берём).
+    """
+
+    def __init__(self, types, attrs, stats=None):
+        self.types = types
+        self.stats = stats or {}
+        self.columns = {name: [] for name in attrs}
+        for name in self.stats:
+            self.columns[f"{name}_sum"] = []
+            self.columns[f"{name}_unit"] = []
+        self._appends = [(name, self.columns[name].append) for name in attrs]
+        # глубина внутри нужного Workout: 0 — вне его, 1 — сам Workout, 2 — прямые дети
+        self._depth = 0
+        # запасные дистанции, которые ещё не найдены: {имя: типы}
+        self._pending = {}
+
+    def start(self, tag, attrib):
+        if self._depth:
+            self._depth += 1
+            if self._depth == 2 and self._pending and tag == "WorkoutStatistics":
+                self._take_stats(attrib)
+            return
+
+        if tag == "Workout" and attrib.get("workoutActivityType") in self.types:
+            self._depth = 1
+            self._pending = dict(self.stats)
+            for name, add in self._appends:
+                add(attrib.get(name))
+            for name in self.stats:
+                self.columns[f"{name}_sum"].append(None)
+                self.columns[f"{name}_unit"].append(None)
+
+    def end(self, tag):
+        if self._depth:
+            self._depth -= 1
+
+    def _take_stats(self, attrib):
+        stat_type = attrib.get("type")
+        names = [name for name, types in self._pending.items() if stat_type in types]
+        if not names:
+            return
+        s = attrib.get("sum")
+        try:
+            float(s)
+        except (TypeError, ValueError):
+            return
+        for name in names:
+            self.columns[f"{name}_sum"][-1] = s
+            self.columns[f"{name}_unit"][-1] = attrib.get("unit")
+            del self._pending[name]
+
+    def close(self):
+        return self.columns
+
+
+def read_workout_columns(path: Path, types, attrs, stats=None) -> dict:
+    """
+    Один проход по export.xml через WorkoutColumns: {атрибут: [строки]}
+    плюс {имя}_sum / {имя}_unit на каждую запасную дистанцию из stats.
+    Значения — сырые строки (или None).
+    """
+    parser = ET.XMLParser(
+        target=WorkoutColumns(types, attrs, stats),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+        load_dtd=False,
+    )
+    with open(path, "rb", buffering=1 << 20) as f:
+        return ET.parse(f, parser)
+
+
+class RecordColumns:
+    """
+    target для XMLParser: атрибуты attrs каждого <Record> (и вложенных
+    в Correlation тоже, как у iterparse с tag="Record") — в списки-колонки.
+
+    Колонки coded (тип, единица, источник — повторяются миллионы раз)
+    держим не списком строк, а парой (коды int32, словарь строка -> код):
+    4 байта на запись вместо ссылки на str. None тоже получает свой код.
+    """
+
+    def __init__(self, attrs, coded=()):
+        self.columns = {}
+        self._appends = []
+        self._coded = []
+        for name in attrs:
+            if name in coded:
+                codes, index = array("i"), {}
+                self.columns[name] = (codes, index)
+                self._coded.append((name, index, codes.append))
+            else:
+                self.columns[name] = []
+                self._appends.append((name, self.columns[name].append))
+
+    def add(self, get) -> None:
+        """Одна запись; get — elem.get или attrib.get."""
+        for name, add in self._appends:
+            add(get(name))
+        for name, index, add in self._coded:
+            add(index.setdefault(get(name), len(index)))
+
+    def start(self, tag, attrib):
+        if tag == "Record":
+            self.add(attrib.get)
+
+    def close(self):
+        return self.columns
+
+
+# столько байт за раз отдаём парсеру из mmap
+FEED_BYTES = 16 << 20
+
+
+def split_records(path: Path, parts: int) -> list:
+    """
+    Делим тело <HealthData> на parts байтовых диапазонов [start, end).
+    Границы — только на началах <Record> верхнего уровня (отступ берём
+    у первого <Record>), так что в каждом куске — целые элементы.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        root = mm.find(b"<HealthData")
+        body_start = mm.find(b">", root) + 1
+        body_end = mm.rfind(b"</HealthData>")
+
+        first = mm.find(b"<Record ", body_start)
+        if first < 0 or parts < 2:
+            return [(body_start, body_end)]
+        line_start = mm.rfind(b"\n", body_start, first) + 1
+        boundary = b"\n" + mm[line_start:first] + b"<Record "
+
+        bounds = [body_start]
+        step = (body_end - body_start) // parts
+        for k in range(1, parts):
+            pos = mm.find(boundary, max(body_start + k * step, bounds[-1]), body_end)
+            if pos < 0:
+                break
+            bounds.append(pos + 1)
+        bounds.append(body_end)
+
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def read_record_columns(path: Path, attrs, start: int, end: int, coded=()) -> dict:
+    """
+    Record из куска [start, end) export.xml (см. split_records): {атрибут: [строки]},
+    для coded — (коды, словарь) как у RecordColumns.
+    Кусок оборачиваем в <HealthData> и кормим парсеру прямо из mmap.
+    """
+    parser = ET.XMLParser(
+        target=RecordColumns(attrs, coded),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+        load_dtd=False,
+    )
+    parser.feed(b"<HealthData>")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for pos in range(start, end, FEED_BYTES):
+            parser.feed(mm[pos:min(pos + FEED_BYTES, end)])
+    parser.feed(b"</HealthData>")
+    return parser.close()
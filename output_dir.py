@@ -0,0 +1,10 @@
+import os
+from pathlib import Path
+
+# all_reports_run кладёт сюда reports/, при одиночном запуске — текущая папка
+REPORTS_DIR_ENV = "REPORTS_DIR"
+
+
+def report_path(name: str) -> Path:
+    """Путь для xlsx-отчёта: сразу в папку отчётов, без переноса после запуска."""
+    return Path(os.environ.get(REPORTS_DIR_ENV, ".")) / name
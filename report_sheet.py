@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pandas as pd
+from xlsxwriter import Workbook
+
+# шапка как у pandas.to_excel: рамка и выравнивание по центру
+HEADER_STYLE = {"border": 1, "align": "center", "valign": "top"}
+
+
+def text_width(col: pd.Series) -> int:
+    """Длина самого длинного значения колонки как текста (пустые не считаем)."""
+    longest = col.dropna().astype(str).str.len().max()
+    return 0 if pd.isna(longest) else int(longest)
+
+
+def add_sheet(
+    wb: Workbook,
+    sheet_name: str,
+    df: pd.DataFrame,
+    cell_style: dict,
+    header_style: dict | None = None,
+    min_width: float = 0,
+) -> None:
+    """
+    Таблица df отдельным листом в открытую книгу xlsxwriter: шапка закреплена,
+    у всех ячеек один формат на лист (а не Font на каждую ячейку), ширина
+    колонки — самый длинный текст + 4, но не меньше min_width.
+    """
+    ws = wb.add_worksheet(sheet_name)
+
+    cell_fmt = wb.add_format(cell_style)
+    header_fmt = wb.add_format({**HEADER_STYLE, **(header_style or cell_style)})
+
+    ws.freeze_panes(1, 0)
+
+    # ширина — по тексту значений, векторно по колонкам DataFrame
+    widths = [max(len(str(c)), text_width(df[c])) for c in df.columns]
+    ws.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+
+    for r, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for c, val in enumerate(row):
+            if val is None or (isinstance(val, float) and val != val):
+                # пустая ячейка, но с тем же шрифтом, что и соседи
+                ws.write_blank(r, c, None, cell_fmt)
+                continue
+            ws.write(r, c, val, cell_fmt)
+
+    for c, width in enumerate(widths):
+        ws.set_column(c, c, max(width + 4, min_width))
+
+
+def write_sheet(
+    out_name: Path,
+    sheet_name: str,
+    df: pd.DataFrame,
+    cell_style: dict,
+    header_style: dict | None = None,
+    min_width: float = 0,
+) -> None:
+    """Книга out_name из одного листа add_sheet."""
+    wb = Workbook(str(out_name))
+    add_sheet(wb, sheet_name, df, cell_style, header_style, min_width)
+    wb.close()
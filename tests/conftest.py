@@ -0,0 +1,118 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+# скрипты лежат плоско в корне репозитория
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+WATCH = 'sourceName="Apple Watch" device="&lt;&lt;HKDevice: 0x1&gt;, name:Apple Watch, model:Watch&gt;"'
+PHONE = 'sourceName="iPhone"'
+
+
+def record(rtype, source, start, value, unit, end=None):
+    end = end or start
+    return (
+        f' <Record type="{rtype}" {source} unit="{unit}" creationDate="{start} +0100"'
+        f' startDate="{start} +0100" endDate="{end} +0100" value="{value}"/>'
+    )
+
+
+def workout(start, source, body="", activity="HKWorkoutActivityTypeWalking", **attrs):
+    extra = "".join(f' {k}="{v}"' for k, v in attrs.items())
+    return (
+        f' <Workout workoutActivityType="{activity}"{extra} {source}'
+        f' creationDate="{start} +0100" startDate="{start} +0100" endDate="{start} +0100">\n'
+        f"{body}"
+        " </Workout>"
+    )
+
+
+def stat(stype, value, unit):
+    return f'  <WorkoutStatistics type="HKQuantityTypeIdentifier{stype}" sum="{value}" unit="{unit}"/>\n'
+
+
+def build_export() -> str:
+    """Маленький export.xml со всеми случаями, на которых расходились пути разбора."""
+    dist = "HKQuantityTypeIdentifierDistanceWalkingRunning"
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        "<!DOCTYPE HealthData [",
+        "<!ELEMENT HealthData (ExportDate,Me,(Record|Correlation|Workout|ActivitySummary)*)>",
+        "<!ATTLIST HealthData locale CDATA #REQUIRED>",
+        "]>",
+        '<HealthData locale="en_US">',
+        ' <ExportDate value="2025-12-10 10:00:00 +0100"/>',
+        ' <Me HKCharacteristicTypeIdentifierDateOfBirth="1980-01-01"/>',
+    ]
+
+    # дистанция, вес, VO2max и пульс по дням; часть — до отсечек
+    for day in range(1, 31):
+        for month in (7, 8, 9, 10, 11):
+            d = f"2025-{month:02d}-{day:02d}"
+            lines.append(record(dist, WATCH, f"{d} 08:00:00", 1.25 + day / 100, "km"))
+            lines.append(record(dist, PHONE, f"{d} 09:00:00", 0.5, "km"))
+            lines.append(record("HKQuantityTypeIdentifierDistanceWalking", WATCH, f"{d} 10:00:00", 300 + day, "m"))
+            lines.append(record("HKQuantityTypeIdentifierDistanceHiking", WATCH, f"{d} 11:00:00", 0.3, "mi"))
+            lines.append(record("HKQuantityTypeIdentifierHeartRate", WATCH, f"{d} 12:00:00", 90 + day, "count/min"))
+            if day % 3 == 0:
+                lines.append(record("HKQuantityTypeIdentifierBodyMass", PHONE, f"{d} 07:00:00", 80 - day / 10, "kg"))
+                lines.append(record("HKQuantityTypeIdentifierBodyMass", PHONE, f"{d} 21:00:00", 80.3 - day / 10, "kg"))
+            if day % 4 == 0:
+                lines.append(record("HKQuantityTypeIdentifierVO2Max", WATCH, f"{d} 13:00:00", 38 + day / 7, "mL/min·kg"))
+                lines.append(record("HKQuantityTypeIdentifierVO2Max", WATCH, f"{d} 14:00:00", 37 + day / 5, "mL/min·kg"))
+
+    # Record внутри Correlation — iterparse с tag="Record" его тоже видит
+    lines += [
+        ' <Correlation type="HKCorrelationTypeIdentifierBloodPressure" sourceName="iPhone"'
+        ' creationDate="2025-09-01 12:00:00 +0100" startDate="2025-09-01 12:00:00 +0100"'
+        ' endDate="2025-09-01 12:00:00 +0100">',
+        " " + record("HKQuantityTypeIdentifierBloodPressureSystolic", PHONE, "2025-09-01 12:00:00", 120, "mmHg"),
+        " </Correlation>",
+    ]
+
+    lines += [
+        # totalDistance в км
+        workout("2025-08-05 18:00:00", WATCH, stat("DistanceWalkingRunning", 9.9, "km"),
+                totalDistance="4.2", totalDistanceUnit="km", duration="50", durationUnit="min"),
+        # без totalDistance: запасная дистанция из WorkoutStatistics в метрах
+        workout("2025-08-12 18:00:00", WATCH, stat("DistanceWalkingRunning", 3500, "m"),
+                duration="1.25", durationUnit="hr"),
+        # сегменты WorkoutActivity со своими статистиками: берём только уровень Workout (3.0)
+        workout(
+            "2025-09-01 18:00:00",
+            WATCH,
+            "  <WorkoutActivity uuid=\"a\">\n"
+            + stat("DistanceWalkingRunning", 1.0, "km")
+            + "  </WorkoutActivity>\n"
+            + "  <WorkoutActivity uuid=\"b\">\n"
+            + stat("DistanceWalkingRunning", 2.0, "km")
+            + "  </WorkoutActivity>\n"
+            + stat("DistanceWalkingRunning", 3.0, "km"),
+            duration="3600", durationUnit="sec",
+        ),
+        # с iPhone и в милях: в недельной сводке есть, в дневной (только часы) — нет
+        workout("2025-09-02 18:00:00", PHONE, totalDistance="2", totalDistanceUnit="mi",
+                duration="40", durationUnit="min"),
+        # первая подходящая статистика у недельной и дневной сводок разная
+        workout("2025-10-07 18:00:00", WATCH,
+                stat("DistanceWalking", 500, "m") + stat("DistanceWalkingRunning", 0.7, "km"),
+                duration="30", durationUnit="min"),
+        # до отсечки и не ходьба — мимо
+        workout("2025-07-15 18:00:00", WATCH, totalDistance="5", totalDistanceUnit="km",
+                duration="60", durationUnit="min"),
+        workout("2025-08-20 18:00:00", WATCH, activity="HKWorkoutActivityTypeRunning",
+                totalDistance="8", totalDistanceUnit="km", duration="45", durationUnit="min"),
+    ]
+
+    lines.append("</HealthData>")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def export_xml(tmp_path, monkeypatch) -> Path:
+    """export.xml во временной папке; скрипты и кэш работают в ней же."""
+    path = tmp_path / "export.xml"
+    path.write_text(build_export(), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    return path
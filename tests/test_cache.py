@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+import cache
+import health_xml
+
+
+@pytest.mark.parametrize("parts", [2, 3, 7])
+def test_split_records_whole_elements(export_xml, parts):
+    ranges = health_xml.split_records(export_xml, parts)
+    data = export_xml.read_bytes()
+
+    assert len(ranges) == parts
+    # куски идут подряд и каждый начинается с <Record верхнего уровня
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    for start, _ in ranges[1:]:
+        assert data[start:].lstrip(b" ").startswith(b"<Record ")
+
+
+@pytest.mark.parametrize("parts", [2, 3, 7])
+def test_parallel_build_matches_serial(export_xml, parts):
+    serial = cache.build_records(export_xml)
+    parallel = cache.build_records_parallel(export_xml, parts)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_load_records_reads_fresh_cache(export_xml):
+    built = cache.load_records(export_xml, columns=["type", "startDate", "value"])
+    assert cache.is_fresh(export_xml)
+    cached = cache.load_records(export_xml, columns=["type", "startDate", "value"])
+    # Record внутри Correlation тоже в таблице
+    assert (cached["type"] == "HKQuantityTypeIdentifierBloodPressureSystolic").sum() == 1
+    assert built["value"].tolist() == cached["value"].tolist()
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import _kernels
+import units
+
+
+def python_version(fn):
+    """Исходная функция без JIT (у numba она в py_func, без numba — сама функция)."""
+    return getattr(fn, "py_func", fn)
+
+
+def test_convert_units_numpy_matches_loop():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 20_000, 1000)
+    values[::17] = np.nan
+    codes = rng.integers(0, 3, 1000).astype(np.int8)
+
+    expected = np.empty_like(values)
+    python_version(_kernels.convert_units_loop)(values, codes, units.DISTANCE_MUL, units.DISTANCE_DIV, expected)
+
+    for fn in (_kernels.convert_units_loop, _kernels.convert_units_numpy, _kernels.convert_units):
+        out = np.empty_like(values)
+        fn(values, codes, units.DISTANCE_MUL, units.DISTANCE_DIV, out)
+        # совпадение до бита, NaN на тех же местах
+        assert np.array_equal(out.view(np.int64), expected.view(np.int64))
+
+
+def test_convert_units_matches_scalar_formulas():
+    values = np.array([1500.0, 1.5, 2.0, np.nan])
+    codes = _kernels.unit_codes(["m", "km", "mi", "km"], units.DISTANCE_UNIT_CODES)
+    out = np.empty_like(values)
+    _kernels.convert_units(values, codes, units.DISTANCE_MUL, units.DISTANCE_DIV, out)
+    assert out[:3].tolist() == [1500.0 / 1000.0, 1.5, 2.0 * 1.60934]
+    assert np.isnan(out[3])
+
+
+@pytest.mark.skipif(not _kernels.HAVE_NUMBA, reason="numba не установлена")
+def test_compiled_kernels_match_python():
+    rng = np.random.default_rng(1)
+    hrs = rng.uniform(80, 190, 500)
+    dts = rng.uniform(0.5, 5, 500)
+    lower = np.array([0.0, 115.0, 135.0, 150.0, 170.0])
+    upper = np.array([114.0, 134.0, 149.0, 169.0, 10_000.0])
+
+    compiled = np.zeros(5)
+    python = np.zeros(5)
+    _kernels.zone_seconds(hrs, dts, lower, upper, compiled)
+    python_version(_kernels.zone_seconds)(hrs, dts, lower, upper, python)
+    # fastmath может переставить сложения — сравниваем с допуском
+    np.testing.assert_allclose(compiled, python, rtol=1e-12)
+
+    hr_t = np.sort(rng.integers(0, 10_000, 500)).astype(np.int64)
+    bounds = np.array([0, 2_500, 2_500, 6_000, 20_000], dtype=np.int64)
+    compiled = np.zeros(4)
+    python = np.zeros(4)
+    _kernels.split_mean_hr(hr_t, hrs, bounds, compiled)
+    python_version(_kernels.split_mean_hr)(hr_t, hrs, bounds, python)
+    assert compiled.tolist() == python.tolist()
@@ -0,0 +1,204 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+import health_last_walk
+import health_xml
+
+WALK = 'workoutActivityType="HKWorkoutActivityTypeWalking"'
+SOURCE = 'sourceName="Apple Watch" duration="30" durationUnit="min"'
+
+
+def dates(start, end=None):
+    end = end or start
+    return f'creationDate="{start} +0100" startDate="{start} +0100" endDate="{end} +0100"'
+
+
+def stats(kcal, km):
+    return (
+        f'  <WorkoutStatistics type="HKQuantityTypeIdentifierActiveEnergyBurned" sum="{kcal}" unit="Cal"/>\n'
+        f'  <WorkoutStatistics type="HKQuantityTypeIdentifierDistanceWalkingRunning" sum="{km}" unit="km"/>\n'
+        '  <MetadataEntry key="HKElevationAscended" value="1250 cm"/>\n'
+    )
+
+
+def build_workouts() -> str:
+    """Тренировки в хвосте экспорта: случаи, на которых поиск с конца может ошибиться."""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<HealthData locale="en_US">',
+        # атрибут в одинарных кавычках — маркер с конца его не найдёт, только полный проход
+        f" <Workout workoutActivityType='HKWorkoutActivityTypeWalking' {SOURCE} {dates('2025-08-20 18:00:00', '2025-08-20 18:30:00')}>",
+        stats(110, 2.5),
+        " </Workout>",
+        f" <Workout {WALK} {SOURCE} {dates('2025-09-01 08:00:00', '2025-09-01 08:30:00')}>",
+        stats(120, 2.6),
+        " </Workout>",
+        # три прогулки за день, последняя по времени — не последняя в файле
+        f" <Workout {WALK} {SOURCE} {dates('2025-09-03 07:00:00', '2025-09-03 07:30:00')}>",
+        stats(130, 2.7),
+        " </Workout>",
+        f" <Workout {WALK} {SOURCE} {dates('2025-09-03 19:00:00', '2025-09-03 19:30:00')}>",
+        stats(140, 2.8),
+        " </Workout>",
+        f" <Workout {WALK} {SOURCE} {dates('2025-09-03 12:00:00', '2025-09-03 12:30:00')}>",
+        stats(150, 2.9),
+        " </Workout>",
+        # самозакрывающийся Workout без детей
+        f" <Workout {WALK} {SOURCE} {dates('2025-09-04 09:00:00', '2025-09-04 09:30:00')}/>",
+        # маркер внутри дочернего элемента чужой тренировки
+        f' <Workout workoutActivityType="HKWorkoutActivityTypeRunning" {SOURCE} {dates("2025-09-05 09:00:00")}>',
+        f"  <MetadataEntry key=\"note\" value='{WALK}'/>",
+        " </Workout>",
+        "</HealthData>",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def workouts_xml(tmp_path, monkeypatch):
+    path = tmp_path / "export.xml"
+    path.write_text(build_workouts(), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    return path
+
+
+def test_iter_from_end_skips_marker_in_child(workouts_xml):
+    marker = health_last_walk.WALKING_MARKER
+    starts = [elem.get("startDate")[:16] for elem in health_xml.iter_from_end(workouts_xml, "Workout", marker)]
+    assert starts == [
+        "2025-09-04 09:00",
+        "2025-09-03 12:00",
+        "2025-09-03 19:00",
+        "2025-09-03 07:00",
+        "2025-09-01 08:00",
+    ]
+
+
+@pytest.mark.parametrize(
+    "target",
+    [None, dt.date(2025, 9, 4), dt.date(2025, 9, 3), dt.date(2025, 9, 1), dt.date(2025, 8, 20)],
+)
+def test_find_last_walking_workout_matches_full_scan(workouts_xml, target):
+    # полный iterparse по всем Workout — исходный алгоритм поиска
+    expected = health_last_walk.scan_walking_workouts(target)
+    found = health_last_walk.find_last_walking_workout(target)
+
+    for key in ("start", "end", "duration_min", "distance", "distance_unit", "elevation_m"):
+        assert found[key] == expected[key]
+    assert found["active_kcal"] == (expected["active_kcal"] or 0.0)
+
+
+def test_find_last_walking_workout_no_match(workouts_xml):
+    assert health_last_walk.scan_walking_workouts(dt.date(2025, 9, 2)) is None
+    with pytest.raises(RuntimeError):
+        health_last_walk.find_last_walking_workout(dt.date(2025, 9, 2))
+
+
+# ---------- зоны и сплиты против исходных циклов ----------
+
+START = dt.datetime(2025, 9, 3, 19, 0, 0)
+
+
+def baseline_zones(hr_samples):
+    """Исходный compute_zones: интервал до следующего замера — в зону lo <= hr <= hi."""
+    zone_secs = {name: 0 for name, _, _ in health_last_walk.ZONES}
+    for i in range(len(hr_samples) - 1):
+        t0, hr = hr_samples[i]
+        t1, _ = hr_samples[i + 1]
+        for name, lo, hi in health_last_walk.ZONES:
+            if lo <= hr <= hi:
+                zone_secs[name] += (t1 - t0).total_seconds()
+                break
+    return {name: "%02d:%02d" % divmod(int(secs), 60) for name, secs in zone_secs.items()}
+
+
+def baseline_splits(hr_samples, dist_samples, start, total_dist_km):
+    """Исходный compute_splits: проход по замерам и интерполяция между соседними."""
+    if not dist_samples:
+        return []
+    eps = 0.05
+    num_full = int(total_dist_km + eps)
+    bounds = list(range(1, num_full + 1))
+    if total_dist_km - num_full > eps:
+        bounds.append(total_dist_km)
+
+    times = [t for t, _ in dist_samples]
+    dists = [d for _, d in dist_samples]
+    splits = []
+    t_prev_end = start
+    prev_t, prev_dist, idx = start, 0.0, 0
+    for i, target in enumerate(bounds, start=1):
+        while idx < len(times) and dists[idx] < target:
+            prev_t, prev_dist = times[idx], dists[idx]
+            idx += 1
+        if idx == len(times):
+            break
+        cur_t, cur_dist = times[idx], dists[idx]
+        if cur_dist == prev_dist:
+            t_target = cur_t
+        else:
+            frac = (target - prev_dist) / (cur_dist - prev_dist)
+            t_target = prev_t + dt.timedelta(seconds=(cur_t - prev_t).total_seconds() * frac)
+
+        sec = int((t_target - t_prev_end).total_seconds())
+        hr_vals = [v for t, v in hr_samples if t_prev_end <= t <= t_target]
+        avg_hr = int(round(sum(hr_vals) / len(hr_vals))) if hr_vals else 0
+        splits.append(
+            {
+                "KM": i,
+                "Time": t_target.strftime("%H:%M"),
+                "Pace": f"{sec // 60}'{sec % 60:02d}\"/KM",
+                "Heart Rate": f"{avg_hr} BPM",
+            }
+        )
+        t_prev_end = t_target
+    return splits
+
+
+def samples(offsets_sec, values):
+    """Пара массивов (datetime64[s], float64), как из collect_hr_and_dist, и те же замеры списком."""
+    times = [START + dt.timedelta(seconds=s) for s in offsets_sec]
+    arrays = (np.array(times, dtype="datetime64[s]"), np.array(values, dtype=np.float64))
+    return arrays, list(zip(times, values))
+
+
+HR = samples(range(0, 2400, 30), [100 + (k * 7) % 75 for k in range(80)])
+
+
+@pytest.mark.parametrize(
+    "hrs",
+    [
+        [110.0, 114.0, 114.5, 115.0, 134.5, 149.2, 169.9, 170.0, 120.0],
+        [114.5] * 5,
+        HR[0][1].tolist(),
+    ],
+)
+def test_compute_zones_matches_loop(hrs):
+    hr, hr_samples = samples([k * 45 for k in range(len(hrs))], hrs)
+    assert health_last_walk.compute_zones(hr) == baseline_zones(hr_samples)
+
+
+@pytest.mark.parametrize(
+    "offsets, km, total",
+    [
+        # пусто: нет замеров дистанции / дистанция меньше хвоста в 50 м
+        ([], [], 2.0),
+        ([300], [0.03], 0.03),
+        # ровная накопленная дистанция с хвостом
+        ([300, 600, 900, 1200, 1500], [0.6, 1.1, 1.7, 2.3, 2.62], 2.62),
+        # накопленная дистанция проседает перед пересечением границы
+        ([300, 600, 900, 1200, 1500, 1800], [0.7, 1.8, 1.5, 2.1, 1.9, 3.05], 3.05),
+        # границы дальше пройденного: сплиты только до 2.2 км
+        ([400, 800, 1200], [0.9, 1.6, 2.2], 3.4),
+        # замер ровно на границе и повтор значения
+        ([300, 600, 900, 1200], [0.5, 1.0, 1.0, 2.0], 2.0),
+    ],
+)
+def test_compute_splits_matches_loop(offsets, km, total):
+    dist, dist_samples = samples(offsets, km)
+    hr, hr_samples = HR
+    assert health_last_walk.compute_splits(hr, dist, START, total) == baseline_splits(
+        hr_samples, dist_samples, START, total
+    )
@@ -0,0 +1,70 @@
+import pytest
+
+import cache
+import health_xml
+import walk_workouts
+import walks_by_week
+import walks_report
+import walks_total
+
+
+def single_pass(xml_path):
+    """Те же колбэки, что в общем проходе all_reports_run."""
+    handlers = {}
+    walk_tables = walks_report.register_walks(handlers)
+    health_xml.parse_once(xml_path, handlers)
+    return walk_tables()
+
+
+def test_workout_statistics_only_direct_children(export_xml):
+    cols = health_xml.read_workout_columns(
+        export_xml, walk_workouts.WORKOUT_TYPES, ["startDate"], walk_workouts.STATS
+    )
+    for name in walk_workouts.STATS:
+        by_start = dict(zip(cols["startDate"], cols[f"{name}_sum"]))
+        assert by_start["2025-09-01 18:00:00 +0100"] == "3.0"
+
+
+@pytest.mark.parametrize("module", [walks_by_week, walks_total])
+def test_segment_statistics_ignored(export_xml, module):
+    df = module.parse_workouts(export_xml)
+    column = "distance_km" if module is walks_by_week else "distance_workouts_km"
+    dist = dict(zip(df["date"].astype(str), df[column]))
+    assert dist["2025-09-01"] == 3.0
+
+
+def test_parse_paths_agree(export_xml):
+    week_single, daily_single, watch_single = single_pass(export_xml)
+
+    week_table = walks_by_week.parse_workouts(export_xml)
+    watch_table = walks_total.parse_workouts(export_xml)
+    daily_table = walks_total.parse_daily_walking(export_xml)
+
+    assert len(week_table) == 5
+    assert week_table.to_dict("list") == week_single.to_dict("list")
+    assert watch_table.to_dict("list") == watch_single.to_dict("list")
+    assert daily_table.to_dict("list") == daily_single.to_dict("list")
+
+
+def test_first_statistics_per_script(export_xml):
+    # у недельной сводки — только DistanceWalkingRunning, у дневной — любая дистанция
+    week = walks_by_week.parse_workouts(export_xml)
+    watch = walks_total.parse_workouts(export_xml)
+    assert dict(zip(week["date"].astype(str), week["distance_km"]))["2025-10-07"] == 0.7
+    assert dict(zip(watch["date"].astype(str), watch["distance_workouts_km"]))["2025-10-07"] == 0.5
+
+
+def test_walk_workouts_one_cache(export_xml):
+    walk_workouts.load(export_xml)
+    cached = sorted(path.name for path in export_xml.parent.glob(".export_cache.*.parquet"))
+    assert cached == [".export_cache.walk_workouts.parquet"]
+
+
+def test_walk_workouts_cache_schema(export_xml):
+    walk_workouts.load(export_xml)
+    # то же имя кэша, другой набор атрибутов — старый Parquet не подходит
+    df = cache.load_workouts("walk_workouts", walk_workouts.WORKOUT_TYPES, ["startDate"], xml_path=export_xml)
+    assert list(df.columns) == ["startDate"]
+
+    df = walk_workouts.load(export_xml)
+    assert list(df.columns) == list(walk_workouts.workout_columns())
@@ -0,0 +1,33 @@
+from functools import partial
+
+import pandas as pd
+import pytest
+
+import extract_vo2max
+import extract_weight_and_vo2
+import health_xml
+
+
+def test_weight_paths_agree(export_xml):
+    cols = extract_weight_and_vo2.record_columns()
+    handlers = {
+        key: [partial(extract_weight_and_vo2.collect, cols=cols)]
+        for key in extract_weight_and_vo2.RECORD_TYPES
+    }
+    health_xml.parse_once(export_xml, handlers)
+    single = extract_weight_and_vo2.aggregate_daily(extract_weight_and_vo2.records_frame(cols))
+
+    table = extract_weight_and_vo2.parse_export(export_xml)
+
+    pd.testing.assert_frame_equal(single, table)
+    # вес — среднее двух взвешиваний, VO2max — максимум двух замеров
+    row = table[table["date"].astype(str) == "2025-09-12"].iloc[0]
+    assert row["weight_kg"] == pytest.approx((80 - 12 / 10 + 80.3 - 12 / 10) / 2)
+    assert row["vo2max"] == max(38 + 12 / 7, 37 + 12 / 5)
+    assert table["date"].min().isoformat() >= extract_weight_and_vo2.START_STR
+
+
+def test_vo2_paths_agree(export_xml):
+    best = {}
+    health_xml.parse_once(export_xml, {extract_vo2max.VO2_TYPE: [partial(extract_vo2max.collect, best=best)]})
+    assert sorted(best.items()) == extract_vo2max.extract_vo2_since_cutoff()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from _kernels import convert_units, unit_codes
+from cache import to_floats
+
+# единицы, которые нужно пересчитывать (км и минуты — как есть)
+METER_UNITS = ("m", "meter", "meters")
+MILE_UNITS = ("mi", "mile", "miles")
+HOUR_UNITS = ("hr", "hour", "hours")
+SECOND_UNITS = ("sec", "second", "seconds")
+
+# коды единиц для convert_units: 0 — км как есть, METERS — метры, MILES — мили
+METERS, MILES = 1, 2
+DISTANCE_UNIT_CODES = {**dict.fromkeys(METER_UNITS, METERS), **dict.fromkeys(MILE_UNITS, MILES)}
+DISTANCE_MUL = np.array([1.0, 1.0, 1.60934])
+DISTANCE_DIV = np.array([1.0, 1000.0, 1.0])
+# 0 — минуты как есть, HOURS — часы, SECONDS — секунды
+HOURS, SECONDS = 1, 2
+DURATION_UNIT_CODES = {**dict.fromkeys(HOUR_UNITS, HOURS), **dict.fromkeys(SECOND_UNITS, SECONDS)}
+DURATION_MUL = np.array([1.0, 60.0, 1.0])
+DURATION_DIV = np.array([1.0, 1.0, 60.0])
+
+
+def distances_to_km(values: np.ndarray, units) -> np.ndarray:
+    """Дистанция в км по целой колонке: метры и мили пересчитываем, остальное — как есть."""
+    out = np.empty_like(values)
+    convert_units(values, unit_codes(units, DISTANCE_UNIT_CODES), DISTANCE_MUL, DISTANCE_DIV, out)
+    return out
+
+
+def workout_distances_km(dist_strs, units, stat_sums, stat_units) -> np.ndarray:
+    """Дистанция тренировок по колонкам: totalDistance, иначе WorkoutStatistics, иначе 0."""
+    dist = to_floats(dist_strs)
+    missing = np.isnan(dist)
+    values = np.where(missing, to_floats(stat_sums), dist)
+    units = np.where(missing, np.asarray(stat_units, dtype=object), np.asarray(units, dtype=object))
+    return np.where(np.isnan(values), 0.0, distances_to_km(values, units))
+
+
+def durations_to_min(values: np.ndarray, units) -> np.ndarray:
+    """Длительность в минутах по целой колонке (values — уже float, NaN -> 0)."""
+    minutes = np.empty_like(values)
+    convert_units(values, unit_codes(units, DURATION_UNIT_CODES), DURATION_MUL, DURATION_DIV, minutes)
+    return np.where(np.isnan(values), 0.0, minutes)
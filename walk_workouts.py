@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pandas as pd
+
+from cache import load_workouts
+from health_xml import fallback_statistics
+
+# тренировки-ходьба: общий источник для walks_by_week и walks_total
+WORKOUT_TYPES = {
+    "HKWorkoutActivityTypeWalking",
+}
+
+# вся ходьба (и Record дистанции у walks_total)
+DISTANCE_TYPES = {
+    "HKQuantityTypeIdentifierDistanceWalkingRunning",
+    "HKQuantityTypeIdentifierDistanceWalking",
+    "HKQuantityTypeIdentifierDistanceHiking",
+}
+
+# запасные дистанции, если у Workout нет totalDistance:
+# walks_by_week берёт только DistanceWalkingRunning, walks_total — любую ходьбу
+STATS = {
+    "walking_running": {"HKQuantityTypeIdentifierDistanceWalkingRunning"},
+    "walking": DISTANCE_TYPES,
+}
+
+# объединение атрибутов Workout обоих скриптов
+WORKOUT_ATTRS = [
+    "startDate",
+    "totalDistance",
+    "totalDistanceUnit",
+    "duration",
+    "durationUnit",
+    "sourceName",
+    "device",
+]
+
+
+def workout_columns() -> dict:
+    """
+    Пустые колонки для collect_workout — те же, что отдаёт read_workout_columns:
+    сырые строки атрибутов плюс {имя}_sum / {имя}_unit на каждую из STATS.
+    """
+    cols = {name: [] for name in WORKOUT_ATTRS}
+    for name in STATS:
+        cols[f"{name}_sum"] = []
+        cols[f"{name}_unit"] = []
+    return cols
+
+
+def collect_workout(elem, cols: dict) -> None:
+    """
+    Колбэк на один <Workout> ходьбы (для общего прохода по XML): только сырые
+    атрибуты, отсечка по дате и пересчёт — в workouts_frame скриптов, как и для кэша.
+    """
+    get = elem.get
+    for name in WORKOUT_ATTRS:
+        cols[name].append(get(name))
+    for name, stat_types in STATS.items():
+        stat_sum, stat_unit = fallback_statistics(elem, get("totalDistance"), stat_types)
+        cols[f"{name}_sum"].append(stat_sum)
+        cols[f"{name}_unit"].append(stat_unit)
+
+
+def load(xml_path: Path) -> pd.DataFrame:
+    """Сырые колонки тренировок-ходьбы — один Parquet на оба скрипта."""
+    print("Читаю тренировки (Workout):", xml_path.name)
+    return load_workouts("walk_workouts", WORKOUT_TYPES, WORKOUT_ATTRS, STATS, xml_path)
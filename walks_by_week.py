@@ -1,172 +1,86 @@
 from pathlib import Path
-from lxml import etree as ET
 import datetime as dt
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
-import math
 
-XML_FILE = Path("export.xml")
-START_DATE = dt.date(2025, 8, 1)  # учитывать только тренировки с августа 2025
+import walk_workouts
+from cache import to_datetime, to_floats
+from output_dir import report_path
+from report_sheet import write_sheet
+from units import durations_to_min, workout_distances_km
 
-# только ходьба
-WORKOUT_TYPES = {
-    "HKWorkoutActivityTypeWalking",
-}
-
-MONTHS_RU = {
-    1: "января",
-    2: "февраля",
-    3: "марта",
-    4: "апреля",
-    5: "мая",
-    6: "июня",
-    7: "июля",
-    8: "августа",
-    9: "сентября",
-    10: "октября",
-    11: "ноября",
-    12: "декабря",
-}
-
-
-def parse_dt(s: str) -> dt.datetime:
-    # формат в export.xml: "2025-11-30 09:48:55 +0100"
-    return dt.datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
-
-
-def distance_value_to_km(value: float, unit: str | None) -> float:
-    if unit in ("m", "meter", "meters"):
-        return value / 1000.0
-    if unit in ("km", "kilometer", "kilometers", None):
-        return value
-    if unit in ("mi", "mile", "miles"):
-        return value * 1.60934
-    return value
-
-
-def get_distance_km_from_workout(elem: ET._Element) -> float:
-    """
-    Дистанция из Workout:
-      1) totalDistance / totalDistanceUnit
-      2) либо из WorkoutStatistics.
-    Возвращаем в км.
-    """
-    dist = None
-    unit = None
-
-    # 1) атрибуты Workout
-    dist_str = elem.get("totalDistance")
-    unit = elem.get("totalDistanceUnit")
-
-    if dist_str:
-        try:
-            dist = float(dist_str)
-        except Exception:
-            dist = None
-
-    # 2) если нет — смотрим WorkoutStatistics
-    if dist is None:
-        for ws in elem.findall("WorkoutStatistics"):
-            t = ws.get("type")
-            if t == "HKQuantityTypeIdentifierDistanceWalkingRunning":
-                s = ws.get("sum")
-                u = ws.get("unit")
-                try:
-                    dist = float(s)
-                    unit = u
-                    break
-                except Exception:
-                    continue
-
-    if dist is None:
-        return 0.0
-
-    return distance_value_to_km(dist, unit)
-
-
-def get_duration_min_from_workout(elem: ET._Element) -> float:
-    """
-    Длительность тренировки в минутах.
-    """
-    dur_str = elem.get("duration")
-    dur_unit = elem.get("durationUnit")
+XML_FILE = Path("export.xml")
 
-    if not dur_str:
-        return 0.0
+SHEET_NAME = "Weekly_walks"
+# один формат на все ячейки листа
+SHEET_STYLE = {"font_size": 28}
+START_DATE = dt.date(2025, 8, 1)  # учитывать только тренировки с августа 2025
 
-    try:
-        dur = float(dur_str)
-    except Exception:
-        return 0.0
+# запасная дистанция, если у Workout нет totalDistance (см. walk_workouts.STATS)
+STAT_NAME = "walking_running"
+
+# колонки таблицы тренировок (workouts_frame)
+WORKOUT_COLUMNS = ["year", "week", "date", "distance_km", "duration_min"]
+
+# родительный падеж месяцев; индекс — номер месяца - 1
+MONTHS_RU = np.array(
+    [
+        "января",
+        "февраля",
+        "марта",
+        "апреля",
+        "мая",
+        "июня",
+        "июля",
+        "августа",
+        "сентября",
+        "октября",
+        "ноября",
+        "декабря",
+    ]
+)
 
-    if dur_unit in (None, "min", "minute", "minutes"):
-        return dur
-    if dur_unit in ("hr", "hour", "hours"):
-        return dur * 60.0
-    if dur_unit in ("sec", "second", "seconds"):
-        return dur / 60.0
 
-    return dur
+def workouts_frame(raw) -> pd.DataFrame:
+    """
+    Таблица тренировок (только с START_DATE и позже) из сырых колонок —
+    walk_workouts (кэш или collect_workout).
+    """
+    raw = pd.DataFrame(raw)
+    if raw.empty:
+        return pd.DataFrame(columns=WORKOUT_COLUMNS)
+
+    # даты — одним вызовом по всему столбцу: формат разбирается один раз, NaT для битых
+    starts = to_datetime(raw["startDate"])
+    keep = (starts >= pd.Timestamp(START_DATE)).to_numpy()
+    raw = raw[keep]
+    starts = starts[keep]
+
+    # ISO-год и неделя — одним вызовом по столбцу, а не date.isocalendar() на строку
+    iso = starts.dt.isocalendar()
+
+    # единицы — по колонкам целиком, без ветвлений на каждую строку
+    return pd.DataFrame(
+        {
+            "year": iso["year"].to_numpy(dtype=np.int64),
+            "week": iso["week"].to_numpy(dtype=np.int64),
+            "date": starts.dt.date.to_numpy(),
+            "distance_km": workout_distances_km(
+                raw["totalDistance"],
+                raw["totalDistanceUnit"],
+                raw[f"{STAT_NAME}_sum"],
+                raw[f"{STAT_NAME}_unit"],
+            ),
+            "duration_min": durations_to_min(to_floats(raw["duration"]), raw["durationUnit"]),
+        }
+    )
 
 
 def parse_workouts(xml_path: Path) -> pd.DataFrame:
     """
     Достаём все тренировки-ходьбы (только с START_DATE и позже).
     """
-    rows = []
-
-    print("Читаю XML (Workout):", xml_path.name)
-    context = ET.iterparse(str(xml_path), events=("end",), tag="Workout")
-
-    for _, elem in tqdm(context, desc="Парсинг тренировок", unit="rec"):
-        w_type = elem.get("workoutActivityType")
-        if w_type not in WORKOUT_TYPES:
-            elem.clear()
-            continue
-
-        start_str = elem.get("startDate")
-        if not start_str:
-            elem.clear()
-            continue
-
-        try:
-            start_dt = parse_dt(start_str)
-        except Exception:
-            elem.clear()
-            continue
-
-        date = start_dt.date()
-        if date < START_DATE:
-            elem.clear()
-            continue
-
-        distance_km = get_distance_km_from_workout(elem)
-        duration_min = get_duration_min_from_workout(elem)
-
-        year, week, _ = date.isocalendar()
-
-        rows.append(
-            {
-                "year": year,
-                "week": week,
-                "date": date,
-                "distance_km": distance_km,
-                "duration_min": duration_min,
-            }
-        )
-
-        elem.clear()
-
-    del context
-
-    if not rows:
-        return pd.DataFrame(
-            columns=["year", "week", "date", "distance_km", "duration_min"]
-        )
-
-    return pd.DataFrame(rows)
+    return workouts_frame(walk_workouts.load(xml_path))
 
 
 def aggregate_weekly(df_raw: pd.DataFrame) -> pd.DataFrame:
@@ -188,8 +102,11 @@ def aggregate_weekly(df_raw: pd.DataFrame) -> pd.DataFrame:
             ]
         )
 
+    # один int-ключ год*100+неделя вместо пары колонок: без MultiIndex,
+    # группы без сортировки — порядок задаём один раз, сортируя ключ
+    yw = df_raw["year"].to_numpy(dtype=np.int64) * 100 + df_raw["week"].to_numpy(dtype=np.int64)
     grp = (
-        df_raw.groupby(["year", "week"])
+        df_raw.groupby(yw, sort=False)
         .agg(
             distance_km=("distance_km", "sum"),
             duration_min=("duration_min", "sum"),
@@ -197,16 +114,16 @@ def aggregate_weekly(df_raw: pd.DataFrame) -> pd.DataFrame:
             week_start=("date", "min"),
             week_end=("date", "max"),
         )
-        .reset_index()
+        # от новых недель к старым
+        .sort_index(ascending=False)
     )
+    grp["year"] = grp.index // 100
+    grp["week"] = grp.index % 100
+    grp = grp.reset_index(drop=True)
 
     grp["time_hours"] = grp["duration_min"] / 60.0
-    grp["avg_pace_min_per_km"] = grp.apply(
-        lambda row: row["duration_min"] / row["distance_km"]
-        if row["distance_km"] > 0
-        else None,
-        axis=1,
-    )
+    # темп — векторно; недели без дистанции -> NaN (в таблице пусто)
+    grp["avg_pace_min_per_km"] = grp["duration_min"].div(grp["distance_km"]).where(grp["distance_km"] > 0)
 
     grp = grp[
         [
@@ -236,59 +153,62 @@ def aggregate_weekly(df_raw: pd.DataFrame) -> pd.DataFrame:
         }
     )
 
-    # сортировка от новых недель к старым
-    grp = grp.sort_values(["Год", "Неделя"], ascending=False).reset_index(drop=True)
     return grp
 
 
 # ---------- форматирование листа 1 ----------
 
-def minutes_to_h_m(minutes: float) -> str:
-    if minutes is None or (isinstance(minutes, float) and math.isnan(minutes)):
-        return ""
-    total_min = int(round(minutes))
-    h = total_min // 60
-    m = total_min % 60
-    return f"{h} ч {m:02d} мин"
-
-
-def hours_to_h_m(hours: float) -> str:
-    if hours is None or (isinstance(hours, float) and math.isnan(hours)):
-        return ""
-    return minutes_to_h_m(hours * 60.0)
-
-
-def pace_to_str(pace_min_per_km: float) -> str:
-    if pace_min_per_km is None or (isinstance(pace_min_per_km, float) and math.isnan(pace_min_per_km)):
-        return ""
-    total_sec = int(round(pace_min_per_km * 60))
-    m = total_sec // 60
-    s = total_sec % 60
-    return f"{m}:{s:02d} мин/км"
-
-
-def distance_to_km_m(dist_km: float) -> str:
-    if dist_km is None or (isinstance(dist_km, float) and math.isnan(dist_km)):
-        return ""
-    dist_km = round(dist_km, 2)
-    km_int = int(dist_km)
-    meters = int(round((dist_km - km_int) * 1000))
-    if meters == 1000:
-        km_int += 1
-        meters = 0
-    return f"{km_int} км {meters} м"
-
-
-def date_to_ru_str(d: dt.date | dt.datetime | pd.Timestamp) -> str:
-    if pd.isna(d):
-        return ""
-    if isinstance(d, pd.Timestamp):
-        d = d.date()
-    if isinstance(d, dt.datetime):
-        d = d.date()
-    month_name = MONTHS_RU.get(d.month, "")
+# Все форматтеры работают на колонке целиком: на входе Series / массив,
+# на выходе массив строк, "" — там, где значения нет (NaN / NaT).
+
+def minutes_to_h_m(minutes) -> np.ndarray:
+    minutes = np.asarray(minutes, dtype=np.float64)
+    total_min = np.rint(np.nan_to_num(minutes)).astype(np.int64)
+    text = np.char.add(
+        np.char.mod("%d ч ", total_min // 60),
+        np.char.mod("%02d мин", total_min % 60),
+    )
+    return np.where(np.isnan(minutes), "", text)
+
+
+def hours_to_h_m(hours) -> np.ndarray:
+    return minutes_to_h_m(np.asarray(hours, dtype=np.float64) * 60.0)
+
+
+def pace_to_str(pace_min_per_km) -> np.ndarray:
+    pace = np.asarray(pace_min_per_km, dtype=np.float64)
+    total_sec = np.rint(np.nan_to_num(pace) * 60).astype(np.int64)
+    text = np.char.mod("%d:", total_sec // 60)
+    text = np.char.add(text, np.char.mod("%02d мин/км", total_sec % 60))
+    return np.where(np.isnan(pace), "", text)
+
+
+def distance_to_km_m(dist_km) -> np.ndarray:
+    dist = np.asarray(dist_km, dtype=np.float64)
+    # до 2 знаков через "%.2f", а не np.round: так же, как round(x, 2),
+    # без ошибок на «половинках» вроде 0.005 / 0.015
+    rounded = np.char.mod("%.2f", np.nan_to_num(dist)).astype(np.float64)
+    km_int = np.trunc(rounded).astype(np.int64)
+    meters = np.rint((rounded - km_int) * 1000).astype(np.int64)
+    # 0.9996 км -> 1000 м: переносим в километры
+    carry = meters == 1000
+    km_int = km_int + carry
+    meters = np.where(carry, 0, meters)
+    text = np.char.add(np.char.mod("%d км ", km_int), np.char.mod("%d м", meters))
+    return np.where(np.isnan(dist), "", text)
+
+
+def date_to_ru_str(dates) -> np.ndarray:
     # формат дд/месяц/год
-    return f"{d.day:02d}/{month_name}/{d.year}"
+    dates = pd.to_datetime(pd.Series(dates))
+    missing = dates.isna().to_numpy()
+    day = dates.dt.day.fillna(1).to_numpy(dtype=np.int64)
+    # названия месяцев — одной выборкой из массива по индексу, без словаря
+    month_name = MONTHS_RU[dates.dt.month.fillna(1).to_numpy(dtype=np.int64) - 1]
+    year = dates.dt.year.fillna(0).to_numpy(dtype=np.int64)
+    text = np.char.add(np.char.mod("%02d/", day), month_name)
+    text = np.char.add(text, np.char.mod("/%d", year))
+    return np.where(missing, "", text)
 
 
 def format_weekly(df: pd.DataFrame) -> pd.DataFrame:
@@ -304,13 +224,13 @@ def format_weekly(df: pd.DataFrame) -> pd.DataFrame:
         df = df.drop(columns=["Неделя"])
 
     # преобразуем поля
-    df["Дистанция, км"] = df["Дистанция, км"].apply(distance_to_km_m)
-    df["Время, мин"] = df["Время, мин"].apply(minutes_to_h_m)
-    df["Время, ч"] = df["Время, ч"].apply(hours_to_h_m)
-    df["Средний темп, мин/км"] = df["Средний темп, мин/км"].apply(pace_to_str)
+    df["Дистанция, км"] = distance_to_km_m(df["Дистанция, км"])
+    df["Время, мин"] = minutes_to_h_m(df["Время, мин"])
+    df["Время, ч"] = hours_to_h_m(df["Время, ч"])
+    df["Средний темп, мин/км"] = pace_to_str(df["Средний темп, мин/км"])
 
-    df["Начало недели"] = df["Начало недели"].apply(date_to_ru_str)
-    df["Конец недели"] = df["Конец недели"].apply(date_to_ru_str)
+    df["Начало недели"] = date_to_ru_str(df["Начало недели"])
+    df["Конец недели"] = date_to_ru_str(df["Конец недели"])
 
     # порядок колонок: сначала даты
     cols_order = [
@@ -332,49 +252,36 @@ def format_weekly(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def output_filename() -> str:
+def output_filename() -> Path:
     now = dt.datetime.now().strftime("%Y%m%d_%H%M")
-    return f"weekly_walk_summary_{now}.xlsx"
-
-
-def autoformat_sheet(ws):
-    """
-    Общий автоформат: крупный шрифт, автоширина.
-    """
-    for col_idx, column_cells in enumerate(ws.columns, start=1):
-        max_len = 0
-        for cell in column_cells:
-            cell.font = Font(size=28)
-            val = cell.value
-            if val is None:
-                continue
-            text = str(val)
-            if len(text) > max_len:
-                max_len = len(text)
-        ws.column_dimensions[get_column_letter(col_idx)].width = max_len + 4
+    return report_path(f"weekly_walk_summary_{now}.xlsx")
 
 
 def save_excel(weekly_df: pd.DataFrame) -> None:
     out_name = output_filename()
     print("Сохраняю в Excel:", out_name)
 
-    with pd.ExcelWriter(out_name, engine="openpyxl") as writer:
-        weekly_df.to_excel(writer, sheet_name="Weekly_walks", index=False)
-        ws = writer.sheets["Weekly_walks"]
-        ws.freeze_panes = "A2"
-        autoformat_sheet(ws)
+    # крупный шрифт, автоширина
+    write_sheet(out_name, SHEET_NAME, weekly_df, SHEET_STYLE)
 
 
-def main():
-    df_workouts = parse_workouts(XML_FILE)
+def weekly_table(df_workouts: pd.DataFrame) -> pd.DataFrame:
+    """Готовый лист Weekly_walks по таблице тренировок."""
     print("Найдено тренировок ходьбы:", len(df_workouts))
 
-    weekly = aggregate_weekly(df_workouts)
-    weekly_formatted = format_weekly(weekly)
+    weekly_formatted = format_weekly(aggregate_weekly(df_workouts))
 
     print("Недель в сводке:", len(weekly_formatted))
+    return weekly_formatted
 
-    save_excel(weekly_formatted)
+
+def report(df_workouts: pd.DataFrame) -> None:
+    save_excel(weekly_table(df_workouts))
+
+
+def main():
+    df_workouts = parse_workouts(XML_FILE)
+    report(df_workouts)
     print("Готово.")
 
 
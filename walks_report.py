@@ -0,0 +1,95 @@
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+from xlsxwriter import Workbook
+
+import walk_workouts
+import walks_by_week
+import walks_total
+import weekly_from_daily
+from cache import is_fresh
+from health_xml import parse_once
+from output_dir import report_path
+from report_sheet import add_sheet
+
+XML_FILE = Path("export.xml")
+
+
+def output_filename() -> Path:
+    return report_path("walks_report.xlsx")
+
+
+def walk_frames(workouts, df_daily_dist: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Три таблицы листов ходьбы из сырых тренировок (общий Parquet или колонки
+    прохода) и дистанции по дням: недели (walks_by_week), дни и тренировки с часов (walks_total).
+    """
+    return (
+        walks_by_week.workouts_frame(workouts),
+        df_daily_dist,
+        walks_total.workouts_frame(workouts),
+    )
+
+
+def pass_frames(walk_cols: dict, dist_cols: dict) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """walk_frames по колонкам, собранным колбэками register_walks."""
+    return walk_frames(walk_cols, walks_total.daily_frame(dist_cols))
+
+
+def register_walks(handlers: dict):
+    """
+    Колбэки всех листов ходьбы для parse_once — и в своём проходе parse_walks,
+    и в общем проходе all_reports_run. Возвращает функцию без аргументов:
+    после прохода она отдаёт те же таблицы, что parse_walks.
+    """
+    walk_cols, dist_cols = walks_total.register_walking(handlers)
+    return partial(pass_frames, walk_cols, dist_cols)
+
+
+def parse_walks(xml_path: Path) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Всё для трёх листов ходьбы: тренировки для недель (walks_by_week),
+    дистанция по дням и тренировки с часов (walks_total).
+    """
+    if is_fresh(xml_path):
+        # Record — из кэша, тренировки — один общий Parquet (или один лёгкий проход по Workout)
+        return walk_frames(walk_workouts.load(xml_path), walks_total.parse_daily_walking(xml_path))
+
+    # кэша нет — один разбор XML на все три листа
+    print("Читаю XML (Record walking + Workout):", xml_path.name)
+    handlers = {}
+    walk_tables = register_walks(handlers)
+    parse_once(xml_path, handlers)
+    return walk_tables()
+
+
+def main():
+    df_workouts, df_daily_dist, df_watch_workouts = parse_walks(XML_FILE)
+
+    weekly = walks_by_week.weekly_table(df_workouts)
+    daily = walks_total.daily_table(df_daily_dist, df_watch_workouts)
+    # недели по дням — из той же таблицы в памяти
+    weekly_from_daily_df = weekly_from_daily.weekly_table(daily)
+
+    out_name = output_filename()
+    print("Сохраняю в Excel:", out_name)
+
+    # одна книга на три листа, у каждого — свои шрифты и ширины, как в отдельных отчётах
+    wb = Workbook(str(out_name))
+    add_sheet(wb, walks_by_week.SHEET_NAME, weekly, walks_by_week.SHEET_STYLE)
+    add_sheet(wb, walks_total.SHEET_NAME, daily, walks_total.SHEET_STYLE)
+    add_sheet(
+        wb,
+        weekly_from_daily.SHEET_NAME,
+        weekly_from_daily_df,
+        weekly_from_daily.CELL_STYLE,
+        header_style=weekly_from_daily.HEADER_STYLE,
+        min_width=weekly_from_daily.MIN_WIDTH,
+    )
+    wb.close()
+    print("Готово.")
+
+
+if __name__ == "__main__":
+    main()
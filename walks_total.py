@@ -1,188 +1,162 @@
+from functools import partial
 from pathlib import Path
-from lxml import etree as ET
 import datetime as dt
 import pandas as pd
-from tqdm import tqdm
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
+
+import walk_workouts
+from cache import is_fresh, load_records, source_contains, to_datetime, to_floats
+from health_xml import parse_once, register
+from output_dir import report_path
+from report_sheet import write_sheet
+from units import distances_to_km, workout_distances_km
 
 XML_FILE = Path("export.xml")
 
-DISTANCE_TYPES = {
-    "HKQuantityTypeIdentifierDistanceWalkingRunning",
-    "HKQuantityTypeIdentifierDistanceWalking",
-    "HKQuantityTypeIdentifierDistanceHiking",
-}
+SHEET_NAME = "Daily_walk"
+# один формат на все ячейки листа
+SHEET_STYLE = {"font_size": 28}
+
+DISTANCE_TYPES = walk_workouts.DISTANCE_TYPES
+
+# запасная дистанция, если у Workout нет totalDistance (см. walk_workouts.STATS)
+STAT_NAME = "walking"
 
-WORKOUT_TYPES = {
-    "HKWorkoutActivityTypeWalking",
-}
+# атрибуты Record дистанции, которые собирает collect_distance
+DISTANCE_ATTRS = ["startDate", "value", "unit", "sourceName", "device"]
 
 # берём только часы
 PRIMARY_DEVICE_MARK = "Watch"
 
 # отсечка по дате
 CUTOFF_DATE = dt.date(2025, 8, 1)
+CUTOFF_STR = CUTOFF_DATE.isoformat()  # сравниваем с префиксом startDate
 
 
-def parse_dt(s: str) -> dt.datetime:
-    return dt.datetime.strptime(s[:19], "%Y-%m-%d %H:%M:%S")
+def distance_columns() -> dict:
+    """Пустые колонки записей дистанции для collect_distance (сырые строки)."""
+    return {name: [] for name in DISTANCE_ATTRS}
 
 
-def distance_value_to_km(value: float, unit: str | None) -> float:
-    if unit in ("m", "meter", "meters"):
-        return value / 1000.0
-    if unit in ("km", "kilometer", "kilometers", None):
-        return value
-    if unit in ("mi", "mile", "miles"):
-        return value * 1.60934
-    return value
-
-
-def is_watch_source(elem: ET._Element) -> bool:
+def collect_distance(elem, cols: dict) -> None:
     """
-    Смотрим и sourceName, и device, нормализуем NBSP → ' '.
+    Колбэк на один <Record> дистанции ходьбы: сырые атрибуты, фильтры — в daily_frame.
     """
-    src = (elem.get("sourceName") or "") + " " + (elem.get("device") or "")
-    src = src.replace("\u00a0", " ")
-    return PRIMARY_DEVICE_MARK in src
+    get = elem.get
+    # ISO-даты сравниваются как строки — старые записи отсекаем сразу
+    start = get("startDate")
+    if not start or start[:10] < CUTOFF_STR:
+        return
 
+    for name in DISTANCE_ATTRS:
+        cols[name].append(get(name))
 
-def parse_workouts(xml_path: Path) -> pd.DataFrame:
+
+def sum_by_date(dates, values, column: str) -> pd.DataFrame:
+    """Сумма по дням из двух колонок — без списка dict'ов."""
+    if len(dates) == 0:
+        return pd.DataFrame(columns=["date", column])
+
+    df = pd.DataFrame({"date": dates, column: values})
+    return df.groupby("date", as_index=False)[column].sum()
+
+
+def workouts_frame(raw) -> pd.DataFrame:
     """
-    Тренировки-ходьба только с часов.
+    Тренировки-ходьба только с часов (с CUTOFF_DATE) из сырых колонок —
+    walk_workouts (кэш или collect_workout).
     Возвращает: date, distance_workouts_km
     """
-    rows = []
-
-    print("Читаю XML (Workout):", xml_path.name)
-    context = ET.iterparse(str(xml_path), events=("end",), tag="Workout")
-
-    for _, elem in tqdm(context, desc="Парсинг тренировок", unit="rec"):
-        w_type = elem.get("workoutActivityType")
-        if w_type not in WORKOUT_TYPES:
-            elem.clear()
-            continue
-
-        if not is_watch_source(elem):
-            elem.clear()
-            continue
-
-        start_str = elem.get("startDate")
-        if not start_str:
-            elem.clear()
-            continue
-
-        try:
-            start_dt = parse_dt(start_str)
-        except Exception:
-            elem.clear()
-            continue
-
-        date = start_dt.date()
-        if date < CUTOFF_DATE:
-            elem.clear()
-            continue
-
-        # дистанция
-        dist = None
-        dist_str = elem.get("totalDistance")
-        unit = elem.get("totalDistanceUnit")
-
-        if dist_str:
-            try:
-                dist = float(dist_str)
-            except Exception:
-                dist = None
-
-        if dist is None:
-            for ws in elem.findall("WorkoutStatistics"):
-                t = ws.get("type")
-                if t in DISTANCE_TYPES:
-                    s = ws.get("sum")
-                    u = ws.get("unit")
-                    try:
-                        dist = float(s)
-                        unit = u
-                        break
-                    except Exception:
-                        continue
-
-        if dist is None:
-            dist_km = 0.0
-        else:
-            dist_km = distance_value_to_km(dist, unit)
-
-        rows.append({"date": date, "distance_workouts_km": dist_km})
-        elem.clear()
-
-    del context
-
-    if not rows:
+    raw = pd.DataFrame(raw)
+    if raw.empty:
         return pd.DataFrame(columns=["date", "distance_workouts_km"])
 
-    df = pd.DataFrame(rows)
-    df = df.groupby("date", as_index=False)["distance_workouts_km"].sum()
-    return df
+    # даты — одним вызовом по всему столбцу: формат разбирается один раз, NaT для битых
+    starts = to_datetime(raw["startDate"])
+    keep = (
+        (starts >= pd.Timestamp(CUTOFF_DATE)).to_numpy()
+        & source_contains(raw, PRIMARY_DEVICE_MARK).to_numpy()
+    )
+    raw = raw[keep]
+
+    # единицы — по колонкам целиком, без ветвлений на каждую строку
+    distance_km = workout_distances_km(
+        raw["totalDistance"], raw["totalDistanceUnit"], raw[f"{STAT_NAME}_sum"], raw[f"{STAT_NAME}_unit"]
+    )
+    return sum_by_date(starts[keep].dt.date.to_numpy(), distance_km, "distance_workouts_km")
 
 
-def parse_daily_walking(xml_path: Path) -> pd.DataFrame:
+def daily_distance(records: pd.DataFrame) -> pd.DataFrame:
     """
-    Сутки ходьбы по Record (только часы).
+    Сутки ходьбы (только часы, с CUTOFF_DATE) по записям дистанции:
+    startDate — datetime, value — float, unit / sourceName / device — строки.
     Возвращает: date, distance_km
     """
-    rows = []
+    dist = records[(records["startDate"] >= pd.Timestamp(CUTOFF_DATE)) & records["value"].notna()]
+    dist = dist[source_contains(dist, PRIMARY_DEVICE_MARK)]
 
-    print("Читаю XML (Record walking):", xml_path.name)
-    context = ET.iterparse(str(xml_path), events=("end",), tag="Record")
+    return sum_by_date(
+        dist["startDate"].dt.date.to_numpy(),
+        distances_to_km(dist["value"].to_numpy(), dist["unit"]),
+        "distance_km",
+    )
 
-    for _, elem in tqdm(context, desc="Парсинг дистанций", unit="rec"):
-        r_type = elem.get("type")
-        if r_type not in DISTANCE_TYPES:
-            elem.clear()
-            continue
 
-        if not is_watch_source(elem):
-            elem.clear()
-            continue
+def daily_frame(cols: dict) -> pd.DataFrame:
+    """daily_distance по сырым колонкам collect_distance."""
+    records = pd.DataFrame(
+        {
+            "startDate": to_datetime(cols["startDate"]),
+            "value": to_floats(cols["value"]),
+            "unit": pd.Series(cols["unit"], dtype=object),
+            "sourceName": pd.Series(cols["sourceName"], dtype=object),
+            "device": pd.Series(cols["device"], dtype=object),
+        }
+    )
+    return daily_distance(records)
 
-        value_str = elem.get("value")
-        unit = elem.get("unit")
-        start = elem.get("startDate")
 
-        if not value_str or not start:
-            elem.clear()
-            continue
+def parse_workouts(xml_path: Path) -> pd.DataFrame:
+    """
+    Тренировки-ходьба только с часов.
+    Возвращает: date, distance_workouts_km
+    """
+    return workouts_frame(walk_workouts.load(xml_path))
 
-        try:
-            value = float(value_str)
-        except Exception:
-            elem.clear()
-            continue
 
-        try:
-            dt_start = parse_dt(start)
-        except Exception:
-            elem.clear()
-            continue
+def parse_daily_walking(xml_path: Path) -> pd.DataFrame:
+    """
+    Сутки ходьбы по Record (только часы).
+    Возвращает: date, distance_km
+    """
+    print("Читаю записи (Record walking):", xml_path.name)
+    records = load_records(xml_path, columns=["type", "startDate", "value", "unit", "sourceName", "device"])
+    return daily_distance(records[records["type"].isin(DISTANCE_TYPES)])
 
-        date = dt_start.date()
-        if date < CUTOFF_DATE:
-            elem.clear()
-            continue
 
-        dist_km = distance_value_to_km(value, unit)
-        rows.append({"date": date, "distance_km": dist_km})
-        elem.clear()
+def register_walking(handlers: dict) -> tuple[dict, dict]:
+    """
+    Колбэки parse_once на Workout ходьбы и Record дистанции — общие для
+    parse_single_pass, walks_report и all_reports_run.
+    Возвращает колонки, которые они заполнят: (тренировки, дистанция).
+    """
+    walk_cols = walk_workouts.workout_columns()
+    dist_cols = distance_columns()
+    register(handlers, walk_workouts.WORKOUT_TYPES, partial(walk_workouts.collect_workout, cols=walk_cols))
+    register(handlers, DISTANCE_TYPES, partial(collect_distance, cols=dist_cols))
+    return walk_cols, dist_cols
 
-    del context
 
-    if not rows:
-        return pd.DataFrame(columns=["date", "distance_km"])
+def parse_single_pass(xml_path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Record дистанции и Workout ходьбы — за один iterparse по export.xml.
+    Возвращает: (date, distance_km), (date, distance_workouts_km)
+    """
+    print("Читаю XML (Record walking + Workout):", xml_path.name)
+    handlers = {}
+    walk_cols, dist_cols = register_walking(handlers)
+    parse_once(xml_path, handlers)
 
-    df = pd.DataFrame(rows)
-    df = df.groupby("date", as_index=False)["distance_km"].sum()
-    return df
+    return daily_frame(dist_cols), workouts_frame(walk_cols)
 
 
 def build_daily_walk_table(df_daily_dist: pd.DataFrame, df_workouts: pd.DataFrame) -> pd.DataFrame:
@@ -208,7 +182,7 @@ def build_daily_walk_table(df_daily_dist: pd.DataFrame, df_workouts: pd.DataFram
 
     df = df.sort_values("date", ascending=False).reset_index(drop=True)
 
-    df["Дата"] = df["date"].apply(lambda d: d.strftime("%m/%d/%Y"))
+    df["Дата"] = pd.to_datetime(df["date"]).dt.strftime("%m/%d/%Y")
     df = df.rename(
         columns={
             "distance_km": "Всего ходьба, км",
@@ -229,45 +203,43 @@ def build_daily_walk_table(df_daily_dist: pd.DataFrame, df_workouts: pd.DataFram
     return df
 
 
-def output_filename() -> str:
-    now = dt.datetime.now().strftime("%Y%m%d_%H%M")
-    return f"daily_walk.xlsx"
-
-
-def autoformat_sheet(ws):
-    for col_idx, column_cells in enumerate(ws.columns, start=1):
-        max_len = 0
-        for cell in column_cells:
-            cell.font = Font(size=28)
-            val = cell.value
-            if val is None:
-                continue
-            text = str(val)
-            if len(text) > max_len:
-                max_len = len(text)
-        ws.column_dimensions[get_column_letter(col_idx)].width = max_len + 4
+def output_filename() -> Path:
+    return report_path("daily_walk.xlsx")
 
 
 def save_excel(daily_df: pd.DataFrame) -> None:
     out_name = output_filename()
     print("Сохраняю в Excel:", out_name)
 
-    with pd.ExcelWriter(out_name, engine="openpyxl") as writer:
-        daily_df.to_excel(writer, sheet_name="Daily_walk", index=False)
-        ws = writer.sheets["Daily_walk"]
-        ws.freeze_panes = "A2"
-        autoformat_sheet(ws)
+    # крупный шрифт, автоширина
+    write_sheet(out_name, SHEET_NAME, daily_df, SHEET_STYLE)
 
 
-def main():
-    df_daily_dist = parse_daily_walking(XML_FILE)
-    df_workouts = parse_workouts(XML_FILE)
+def parse_walking(xml_path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Дистанция по дням и тренировки-ходьба: (date, distance_km), (date, distance_workouts_km)."""
+    if is_fresh(xml_path):
+        # Record — из кэша, по XML идёт только лёгкий проход за Workout
+        return parse_daily_walking(xml_path), parse_workouts(xml_path)
+    # кэша нет — не строим его ради одного скрипта, всё за один разбор XML
+    return parse_single_pass(xml_path)
 
+
+def daily_table(df_daily_dist: pd.DataFrame, df_workouts: pd.DataFrame) -> pd.DataFrame:
+    """Готовый лист Daily_walk: build_daily_walk_table с печатью счётчиков."""
     print("Дней с данными ходьбы:", len(df_daily_dist))
     print("Дней с тренировками ходьбы:", len(df_workouts))
+    return build_daily_walk_table(df_daily_dist, df_workouts)
+
+
+def report(df_daily_dist: pd.DataFrame, df_workouts: pd.DataFrame) -> pd.DataFrame:
+    """Пишет daily_walk.xlsx и отдаёт ту же таблицу (для weekly_from_daily — без read_excel)."""
+    table = daily_table(df_daily_dist, df_workouts)
+    save_excel(table)
+    return table
 
-    daily_table = build_daily_walk_table(df_daily_dist, df_workouts)
-    save_excel(daily_table)
+
+def main():
+    report(*parse_walking(XML_FILE))
     print("Готово.")
 
 
@@ -1,47 +1,26 @@
-from pathlib import Path
 import datetime as dt
+import numpy as np
 import pandas as pd
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
 
-INPUT_FILE = Path("daily_walk.xlsx")  # файл с листом Daily_walk
+import walks_total
+from output_dir import report_path
+from report_sheet import write_sheet
 
+SHEET_NAME = "Weekly_from_daily"
 
-def autoformat_sheet(ws):
-    """
-    Делает таблицу удобной:
-    - заголовки: шрифт 16, жирный
-    - данные: шрифт 14
-    - ширина колонок: макс(длина текста + 4, 18)
-    """
-    # сначала проставим шрифты
-    for row_idx, row in enumerate(ws.iter_rows(), start=1):
-        for cell in row:
-            if row_idx == 1:
-                # заголовки
-                cell.font = Font(size=16, bold=True)
-            else:
-                cell.font = Font(size=14)
-
-    # теперь подберём ширину
-    for col_idx, column_cells in enumerate(ws.columns, start=1):
-        max_len = 0
-        for cell in column_cells:
-            val = cell.value
-            if val is None:
-                continue
-            text = str(val)
-            if len(text) > max_len:
-                max_len = len(text)
-
-        # запас + минимальная ширина
-        width = max(max_len + 4, 18)
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
+# заголовки — шрифт 16, жирный; данные — шрифт 14;
+# ширина колонок: макс(длина текста + 4, 18)
+CELL_STYLE = {"font_size": 14}
+HEADER_STYLE = {"font_size": 16, "bold": True}
+MIN_WIDTH = 18
 
 
-def main():
-    # читаем лист Daily_walk
-    df = pd.read_excel(INPUT_FILE, sheet_name="Daily_walk")
+def weekly_table(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Недельная сводка по таблице Daily_walk (walks_total.build_daily_walk_table) —
+    в памяти, без повторного чтения daily_walk.xlsx.
+    """
+    df = daily.copy()
 
     # приводим дату к datetime
     df["date"] = pd.to_datetime(df["Дата"], format="%m/%d/%Y")
@@ -54,9 +33,10 @@ def main():
     df["year"] = isocal["year"]
     df["week"] = isocal["week"]
 
-    # агрегируем по неделям
+    # агрегируем по неделям: один int-ключ год*100+неделя, без MultiIndex и сортировки групп
+    yw = df["year"].to_numpy(dtype=np.int64) * 100 + df["week"].to_numpy(dtype=np.int64)
     weekly = (
-        df.groupby(["year", "week"])
+        df.groupby(yw, sort=False)
         .agg(
             week_start=("date", "min"),
             week_end=("date", "max"),
@@ -65,7 +45,9 @@ def main():
             workout_walk_km=("Ходьба в тренировках, км", "sum"),
             nonwork_walk_km=("Ходьба вне тренировок, км", "sum"),
         )
-        .reset_index()
+        # сортировка от новых недель к старым — по тому же ключу
+        .sort_index(ascending=False)
+        .reset_index(drop=True)
     )
 
     # среднее в день по каждой неделе
@@ -79,11 +61,6 @@ def main():
         weekly["nonwork_walk_km"] / weekly["total_walk_km"] * 100
     ).round(1)
 
-    # сортировка от новых недель к старым
-    weekly = weekly.sort_values(["year", "week"], ascending=False).reset_index(
-        drop=True
-    )
-
     # красивый формат дат
     weekly["Начало недели"] = weekly["week_start"].dt.strftime("%d.%m.%Y")
     weekly["Конец недели"] = weekly["week_end"].dt.strftime("%d.%m.%Y")
@@ -125,17 +102,32 @@ def main():
         }
     )
 
-    out_name = "weekly_from_daily_walk.xlsx"
+    return weekly
+
+
+def report(daily: pd.DataFrame) -> None:
+    weekly = weekly_table(daily)
+
+    out_name = report_path("weekly_from_daily_walk.xlsx")
     print("Сохраняю:", out_name)
 
-    with pd.ExcelWriter(out_name, engine="openpyxl") as writer:
-        weekly.to_excel(writer, sheet_name="Weekly_from_daily", index=False)
-        ws = writer.sheets["Weekly_from_daily"]
-        ws.freeze_panes = "A2"
-        autoformat_sheet(ws)
+    write_sheet(
+        out_name,
+        SHEET_NAME,
+        weekly,
+        CELL_STYLE,
+        header_style=HEADER_STYLE,
+        min_width=MIN_WIDTH,
+    )
 
     print("Готово. Недель:", len(weekly))
 
 
+def main():
+    # таблица Daily_walk — та же, что пишет walks_total.py, но сразу DataFrame
+    df_daily_dist, df_workouts = walks_total.parse_walking(walks_total.XML_FILE)
+    report(walks_total.build_daily_walk_table(df_daily_dist, df_workouts))
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file